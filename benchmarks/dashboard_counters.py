@@ -0,0 +1,86 @@
+"""Compare the GROUP BY scans the branch tiles used with the counter table.
+
+Run inside an Odoo shell of a database where vet_test is installed with at
+least one posted customer invoice and one branch:
+
+    odoo-bin shell -d <db> < benchmarks/dashboard_counters.py
+
+Copies of a posted invoice are inserted into account_move, spread over the
+branches and payment states, until 10k, 100k and 1M invoices were added.
+The insert fires the counter triggers like a real posting would. At each
+size the previous per-branch invoice scan is timed against the counter
+read, then the whole /vet_test/dashboard/summary payload is timed. The
+whole transaction is rolled back at the end.
+"""
+import time
+
+SIZES = (10_000, 100_000, 1_000_000)
+REPEAT = 20
+
+OLD_QUERY = """
+    SELECT analytic_account_id,
+           COUNT(*) FILTER (WHERE payment_state != 'paid'),
+           COUNT(*) FILTER (WHERE payment_state = 'paid')
+    FROM account_move
+    WHERE move_type = 'out_invoice' AND state = 'posted' AND analytic_account_id IN %s
+    GROUP BY analytic_account_id
+"""
+
+
+def timed(run, repeat=REPEAT):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000.0
+
+
+def seed_invoices(cr, template_id, branch_ids, count):
+    """Insert ``count`` copies of the template invoice; returns the time taken in ms."""
+    cr.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'account_move' AND column_name != 'id'
+    """)
+    columns = [row[0] for row in cr.fetchall()]
+    overrides = {
+        'name': "name || '-BENCH-' || g",
+        'analytic_account_id': "(%(branches)s::int[])[1 + g %% %(branch_count)s]",
+        'payment_state': "CASE WHEN g %% 3 = 0 THEN 'not_paid' ELSE 'paid' END",
+    }
+    select = ", ".join(overrides.get(column, f'"{column}"') for column in columns)
+    start = time.perf_counter()
+    cr.execute(f"""
+        INSERT INTO account_move ({", ".join(f'"{column}"' for column in columns)})
+        SELECT {select}
+        FROM account_move, generate_series(1, %(count)s) g
+        WHERE id = %(template)s
+    """, {'branches': list(branch_ids), 'branch_count': len(branch_ids), 'count': count, 'template': template_id})
+    return (time.perf_counter() - start) * 1000.0
+
+
+cr = env.cr  # noqa: F821 - provided by odoo-bin shell
+Dashboard = env['vet.dashboard']  # noqa: F821
+admin = env.ref('base.user_admin')  # noqa: F821
+try:
+    template = env['account.move'].search([  # noqa: F821
+        ('move_type', '=', 'out_invoice'), ('state', '=', 'posted'),
+    ], limit=1)
+    branch_ids = tuple(env['account.analytic.account'].search([]).ids)  # noqa: F821
+    env.flush_all()  # noqa: F821
+    Dashboard._compact_counters()
+
+    print(f"{'invoices':>10} | {'scan (ms)':>10} | {'counters (ms)':>13} | {'summary (ms)':>12} | {'insert (ms)':>11}")
+    added = 0
+    for size in SIZES:
+        insert_ms = seed_invoices(cr, template.id, branch_ids, size - added)
+        added = size
+        Dashboard._compact_counters()
+        cr.execute("ANALYZE account_move")
+        scan_ms = timed(lambda: (cr.execute(OLD_QUERY, (branch_ids,)), cr.fetchall()))
+        counter_ms = timed(lambda: Dashboard._read_counters(branch_ids))
+        summary_ms = timed(Dashboard.with_user(admin)._get_branch_summary)
+        print(f"{size:>10} | {scan_ms:>10.3f} | {counter_ms:>13.3f} | {summary_ms:>12.3f} | {insert_ms:>11.1f}")
+finally:
+    cr.rollback()
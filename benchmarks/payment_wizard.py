@@ -0,0 +1,96 @@
+"""Compare per-invoice payments with the single payment of the visit payment wizard.
+
+Run inside an Odoo shell of a database where vet_test is installed with a
+chart of accounts and a cash journal:
+
+    odoo-bin shell -d <db> < benchmarks/payment_wizard.py
+
+An owner with 30 open invoices pays 70% of the balance, once through the
+previous flow (one account.payment.register per invoice) and once through
+action_confirm_payment, each from the same savepoint. Query counts, timings,
+payment counts and the resulting invoice residuals are compared; the whole
+transaction is rolled back at the end.
+"""
+import time
+
+INVOICES = 30
+PAID_SHARE = 0.7
+
+
+def per_invoice_payments(wizard, invoices, amount):
+    """The previous allocation loop: one register wizard and payment per invoice."""
+    remaining_amount = amount
+    for invoice in invoices:
+        if remaining_amount <= 0:
+            break
+        payment_amount = min(remaining_amount, invoice.amount_residual)
+        if payment_amount <= 0:
+            continue
+        payment_wizard = env['account.payment.register'].with_context(  # noqa: F821
+            active_model='account.move',
+            active_ids=[invoice.id],
+            default_amount=payment_amount,
+            default_journal_id=wizard.journal_id.id,
+        ).create({})
+        payment_wizard.payment_difference_handling = 'reconcile' if payment_amount >= invoice.amount_residual else 'open'
+        payment_wizard._create_payments()
+        remaining_amount -= payment_amount
+
+
+def measure(cr, run, invoices):
+    cr.execute("SAVEPOINT bench_payment")
+    env.invalidate_all()  # noqa: F821
+    payment_ids = set(env['account.payment'].search([]).ids)  # noqa: F821
+    queries = cr.sql_log_count
+    start = time.perf_counter()
+    run()
+    env.flush_all()  # noqa: F821
+    elapsed = time.perf_counter() - start
+    queries = cr.sql_log_count - queries
+    env.invalidate_all()  # noqa: F821
+    payments = len(set(env['account.payment'].search([]).ids) - payment_ids)  # noqa: F821
+    residuals = [round(residual, 2) for residual in invoices.mapped('amount_residual')]
+    cr.execute("ROLLBACK TO SAVEPOINT bench_payment")
+    env.invalidate_all()  # noqa: F821
+    return elapsed, queries, payments, residuals
+
+
+cr = env.cr  # noqa: F821 - provided by odoo-bin shell
+try:
+    journal = env['account.journal'].search([('type', '=', 'cash')], limit=1)  # noqa: F821
+    partner = env['res.partner'].create({'name': 'Bench owner'})  # noqa: F821
+    owner = env['vet.animal.owner'].create({'partner_id': partner.id})  # noqa: F821
+    animal = env['vet.animal'].create({'name': 'Bench animal', 'owner_id': owner.id})  # noqa: F821
+    visit = env['vet.animal.visit'].create({'owner_id': owner.id, 'animal_id': animal.id})  # noqa: F821
+    account_id = env['product.product']._vet_default_income_account_id()  # noqa: F821
+    invoices = env['account.move'].create([{  # noqa: F821
+        'partner_id': partner.id,
+        'move_type': 'out_invoice',
+        'invoice_date': f'2024-01-{day + 1:02d}',
+        'invoice_line_ids': [(0, 0, {
+            'name': f'Bench line {day}',
+            'quantity': 1.0,
+            'price_unit': 100.0 + day * 7.35,
+            'account_id': account_id,
+            'tax_ids': [(6, 0, [])],
+        })],
+    } for day in range(INVOICES)])
+    invoices.action_post()
+    amount = round(sum(invoices.mapped('amount_residual')) * PAID_SHARE, 2)
+    wizard = env['vet.animal.visit.payment.wizard'].create({  # noqa: F821
+        'visit_id': visit.id,
+        'journal_id': journal.id,
+        'payment_method': 'cash',
+        'amount': amount,
+    })
+    env.flush_all()  # noqa: F821
+
+    old = measure(cr, lambda: per_invoice_payments(wizard, invoices, amount), invoices)
+    new = measure(cr, wizard.action_confirm_payment, invoices)
+
+    print(f"{'flow':>12} | {'time (s)':>9} | {'queries':>8} | {'payments':>8}")
+    for label, (elapsed, queries, payments, __) in (('per invoice', old), ('single', new)):
+        print(f"{label:>12} | {elapsed:>9.2f} | {queries:>8} | {payments:>8}")
+    print("residuals identical:", old[3] == new[3])
+finally:
+    cr.rollback()
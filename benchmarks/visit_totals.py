@@ -0,0 +1,77 @@
+"""Compare the per-record visit totals with the batched _compute_totals.
+
+Run inside an Odoo shell of a database where vet_test is installed:
+
+    odoo-bin shell -d <db> < benchmarks/visit_totals.py
+
+100k synthetic visits with three lines each (one per service type, random
+quantities and prices) are inserted with plain SQL, both computations are
+timed on the same records and their results compared exactly; the whole
+transaction is rolled back at the end.
+"""
+import time
+
+VISITS = 100_000
+
+
+def per_record_totals(visits):
+    """The previous _compute_totals, minus the field assignment and logging."""
+    result = {}
+    for visit in visits:
+        all_lines = visit.service_line_ids + visit.test_line_ids + visit.medicine_line_ids
+        subtotal = sum(line.quantity * line.price_unit for line in all_lines if line.quantity and line.price_unit)
+        total = subtotal + (visit.treatment_charge or 0.0)
+        if visit.discount_percent > 0:
+            total -= total * (visit.discount_percent / 100.0)
+        elif visit.discount_fixed > 0:
+            total -= visit.discount_fixed
+        result[visit.id] = (subtotal, float(total or 0.0))
+    return result
+
+
+cr = env.cr  # noqa: F821 - provided by odoo-bin shell
+Visit = env['vet.animal.visit']  # noqa: F821
+try:
+    services = env['vet.service'].create([  # noqa: F821
+        {'name': f'Bench {service_type}', 'service_type': service_type, 'price': 10.0}
+        for service_type in ('service', 'test', 'vaccine')
+    ])
+    animal = env['vet.animal'].create({'name': 'Bench animal'})  # noqa: F821
+    env.flush_all()  # noqa: F821
+
+    cr.execute("""
+        INSERT INTO vet_animal_visit (name, animal_id, date, state, treatment_charge, discount_percent, discount_fixed)
+        SELECT 'BENCH' || g, %s, now() AT TIME ZONE 'UTC', 'draft',
+               CASE WHEN g % 4 = 0 THEN round((random() * 50)::numeric, 2) ELSE 0 END,
+               CASE WHEN g % 5 = 0 THEN 7.5 ELSE 0 END,
+               CASE WHEN g % 5 = 1 THEN 3.3 ELSE 0 END
+        FROM generate_series(1, %s) g
+        RETURNING id
+    """, (animal.id, VISITS))
+    visit_ids = [row[0] for row in cr.fetchall()]
+    cr.execute("""
+        INSERT INTO vet_animal_visit_line (visit_id, service_id, line_type, quantity, price_unit)
+        SELECT v, s.id, s.service_type, ceil(random() * 3), round((random() * 200)::numeric, 2)
+        FROM unnest(%s::int[]) v, vet_service s
+        WHERE s.id IN %s
+    """, (visit_ids, tuple(services.ids)))
+    cr.execute("ANALYZE vet_animal_visit_line")
+
+    env.invalidate_all()  # noqa: F821
+    start = time.perf_counter()
+    expected = per_record_totals(Visit.browse(visit_ids))
+    old_s = time.perf_counter() - start
+
+    env.invalidate_all()  # noqa: F821
+    visits = Visit.browse(visit_ids)
+    start = time.perf_counter()
+    queries = cr.sql_log_count
+    visits._compute_totals()
+    new_s = time.perf_counter() - start
+    queries = cr.sql_log_count - queries
+
+    mismatches = [visit.id for visit in visits if (visit.subtotal, visit.total_amount) != expected[visit.id]]
+    print(f"{'visits':>8} | {'per record (s)':>15} | {'batched (s)':>12} | {'batched queries':>16} | {'mismatches':>10}")
+    print(f"{VISITS:>8} | {old_s:>15.2f} | {new_s:>12.2f} | {queries:>16} | {len(mismatches):>10}")
+finally:
+    cr.rollback()
@@ -1 +1,16 @@
 from . import models
+from . import controller
+
+
+def uninstall_hook(env):
+    # The dashboard counters are plain SQL objects hanging off tables that
+    # outlive the module (account_move), so they are removed explicitly.
+    env.cr.execute("""
+        DROP TRIGGER IF EXISTS vet_dashboard_count_insert ON account_move;
+        DROP TRIGGER IF EXISTS vet_dashboard_count_delete ON account_move;
+        DROP TRIGGER IF EXISTS vet_dashboard_count_update ON account_move;
+        DROP FUNCTION IF EXISTS vet_dashboard_count_invoices() CASCADE;
+        DROP FUNCTION IF EXISTS vet_dashboard_count_rows() CASCADE;
+        DROP TABLE IF EXISTS vet_dashboard_counter_delta;
+        DROP TABLE IF EXISTS vet_dashboard_counter;
+    """)
@@ -14,7 +14,7 @@ Manage the animals that visit our veterinarian
     # Check https://github.com/odoo/odoo/blob/15.0/odoo/addons/base/data/ir_module_category_data.xml
     # for the full list
     'category': 'Animals',
-    'version': '1.0',
+    'version': '1.1',
 
     # any module necessary for this one to work correctly
     'depends': ['base','mail','contacts','product','account','account_accountant','stock'],
@@ -24,21 +24,38 @@ Manage the animals that visit our veterinarian
         'security/vet_security.xml',
         'security/ir.model.access.csv',  # Security rules
         'security/vet_history_rules.xml',
+        'security/vet_receivable_rules.xml',
         'data/sequence_data.xml',
         'data/visit_sequence_data.xml',
         'data/treatment_product.xml',
         'data/vet_dashboard_data.xml',
+        'data/vet_revenue_data.xml',
+        'data/vet_doctor_commission_data.xml',
+        'data/vet_export_data.xml',
+        'data/vet_forecast_data.xml',
+        'data/vet_receivable_ledger_data.xml',
+        'data/vet_delivery_job_data.xml',
         'views/vet_dashboard_views.xml',
         'views/animal_views.xml',
         'views/animal_doctor_views.xml',
         'views/animal_owner_views.xml',
         'views/res_partner_views.xml',
+        'views/account_analytic_account_views.xml',
         'views/animal_appointment_views.xml',
         'views/animal_visits_views.xml',
         'views/report.xml',
         'views/animal_invoice_views.xml',
+        'views/invoice_dashboard_templates.xml',
         'views/animal_history.xml',
         'views/service_views.xml',
+        'views/vet_revenue_views.xml',
+        'views/vet_receivable_aging_views.xml',
+        'views/vet_doctor_commission_views.xml',
+        'views/vet_export_job_views.xml',
+        'views/vet_consolidated_report_views.xml',
+        'views/vet_forecast_views.xml',
+        'views/vet_delivery_job_views.xml',
+        'views/vet_payment_import_views.xml',
         'views/menu_vet_views.xml',
 
     ],
@@ -46,7 +63,11 @@ Manage the animals that visit our veterinarian
     'web.report_assets_common': [
         'vet_test/static/src/img/logo.png',
         'vet_test/static/src/css/vet_styles.css',
-    ]
+    ],
+    'web.assets_backend': [
+        'vet_test/static/src/dashboard/*',
+        'vet_test/static/src/queue/*',
+    ],
 },
 'controllers': [
         'controllers/dashboard_controller.py',
@@ -56,6 +77,7 @@ Manage the animals that visit our veterinarian
     'installable': True,
     'application': True,
     'auto_install': False,
+    'uninstall_hook': 'uninstall_hook',
 }
 
 
@@ -1,30 +1,81 @@
 from odoo import http
 from odoo.http import request
 from odoo.tools.safe_eval import safe_eval
+from odoo.addons.vet_test.tools import metrics, replica
+import hmac
 import logging
 
 _logger = logging.getLogger(__name__)
 
 class AccountMoveDashboardController(http.Controller):
-    @http.route('/vet_test/invoice_dashboard', type='json', auth='user')
-    def invoice_dashboard(self, domain, **kwargs):
+    @http.route('/vet_test/invoice_dashboard', type='http', auth='user', methods=['GET'])
+    def invoice_dashboard(self, domain=None, **kwargs):
         """
         Controller to fetch invoice dashboard data and render the banner.
+
+        The response carries an ETag; pollers sending it back in
+        If-None-Match get an empty 304 while the totals are unchanged.
         """
         try:
             # Evaluate the domain safely
             invoice_domain = safe_eval(domain or '[]')
             _logger.debug("Invoice dashboard domain: %s", invoice_domain)
-            
+
             # Get totals using the model's helper method
-            totals = request.env['account.move']._get_dashboard_totals(invoice_domain)
+            with metrics.track('invoice_dashboard', request.env.cr), replica.reporting_env(request.env) as env:
+                totals = env['account.move']._get_dashboard_totals(invoice_domain)
             _logger.debug("Dashboard totals: %s", totals)
-            
+
+            etag = totals['etag']
+            headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+            if request.httprequest.if_none_match.contains(etag):
+                response = request.make_response('', headers=headers)
+                response.status_code = 304
+                return response
+
             # Render the QWeb template
-            return request.env['ir.ui.view']._render_template(
+            html = request.env['ir.ui.view']._render_template(
                 "vet_test.invoice_dashboard_banner",
-                totals
+                dict(totals, currency=request.env.company.currency_id),
             )
+            return request.make_response(html, headers=headers + [('Content-Type', 'text/html; charset=utf-8')])
         except Exception as e:
             _logger.error("Error in invoice_dashboard controller: %s", str(e))
-            return {'html': '<div class="alert alert-danger">Error loading dashboard totals</div>'}
+            return request.make_response(
+                '<div class="alert alert-danger">Error loading dashboard totals</div>',
+                headers=[('Content-Type', 'text/html; charset=utf-8')],
+            )
+
+
+class VetDashboardController(http.Controller):
+    @http.route('/vet_test/dashboard/summary', type='json', auth='user')
+    def dashboard_summary(self, **kwargs):
+        """All dashboard tiles of the current user's branches in one payload."""
+        with replica.reporting_env(request.env) as env:
+            return env['vet.dashboard']._get_branch_summary()
+
+    @http.route('/vet_test/queue', type='json', auth='user')
+    def queue_board(self, branch_id=None, **kwargs):
+        """Today's waiting room queue of one branch (defaults to the user's first branch)."""
+        return request.env['vet.animal.visit']._get_queue_board(branch_id=branch_id)
+
+
+class VetMetricsController(http.Controller):
+    @http.route('/vet_test/metrics', type='http', auth='public', methods=['GET'], csrf=False, save_session=False)
+    def metrics(self, **kwargs):
+        """Prometheus scrape target.
+
+        Requires ``Authorization: Bearer <token>`` matching the
+        ``vet_test.metrics_token`` system parameter; disabled while unset.
+        """
+        token = request.env['ir.config_parameter'].sudo().get_param('vet_test.metrics_token')
+        auth = request.httprequest.headers.get('Authorization', '')
+        if not token or not hmac.compare_digest(auth.encode(), f'Bearer {token}'.encode()):
+            return request.make_response('Unauthorized', status=401, headers=[('Content-Type', 'text/plain')])
+        snapshot = metrics.load(request.env.cr)
+        with replica.reporting_env(request.env) as env:
+            gauges = env['vet.dashboard'].sudo()._get_metrics_gauges()
+        return request.make_response(
+            metrics.render(snapshot, gauges),
+            headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'), ('Cache-Control', 'no-store')],
+        )
@@ -0,0 +1,17 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Link the payments the visit wizard made before account.payment.visit_id
+    existed, recognised by the reference it gave them."""
+    cr.execute("""
+        UPDATE account_payment p
+        SET visit_id = v.id
+        FROM vet_animal_visit v
+        WHERE p.visit_id IS NULL
+          AND p.payment_reference LIKE 'Payment for %'
+          AND v.name = substring(p.payment_reference FROM '^Payment for (.+?)(?: - Invoice .*)?$')
+    """)
+    _logger.info("Linked %s existing payment(s) to their visit", cr.rowcount)
@@ -1,4 +1,6 @@
-from . import animal, animal_owner, animal_doctor, service
+from . import animal, animal_owner, animal_doctor, service, product
 from . import vet_animal_visit_line, animalvisit
-from . import animal_schedule, vet_dashboard, account_move
-from . import animal_history
\ No newline at end of file
+from . import animal_schedule, vet_dashboard, account_move, vet_revenue_daily
+from . import animal_history, ir_websocket, vet_receivable_aging, vet_doctor_commission
+from . import vet_export_job, vet_consolidated_report, vet_forecast, vet_receivable_ledger, vet_delivery_job
+from . import vet_payment_import, vet_metrics_flow
\ No newline at end of file
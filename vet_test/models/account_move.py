@@ -2,10 +2,27 @@ from odoo import fields, models, api, _
 from odoo.osv import expression
 from datetime import datetime
 from odoo.exceptions import UserError
+from odoo.tools import SQL, create_index
+from odoo.tools.lru import LRU
+from collections import defaultdict
+import hashlib
 import logging
+import time
 
 _logger = logging.getLogger(__name__)
 
+# Dashboard total field -> payment methods it sums amount_total over
+DASHBOARD_PAYMENT_METHODS = {
+    'dashboard_total_cash': ('cash',),
+    'dashboard_total_bank': ('bank',),
+    'dashboard_total_online': ('online', 'credit', 'credit_card'),
+}
+
+# (db, uid, companies, branches, domain) -> (stamp, expiry, totals)
+_DASHBOARD_TOTALS_CACHE = LRU(512)
+# Safety net for changes the write_date stamp cannot see (e.g. deleted drafts)
+DASHBOARD_TOTALS_TTL = 300
+
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
@@ -148,14 +165,6 @@ class AccountMove(models.Model):
     def create(self, vals_list):
         if not isinstance(vals_list, list):
             vals_list = [vals_list]
-        try:
-            default_account = self.env['ir.property'].sudo().get('property_account_income_categ_id', 'product.category')
-            if not default_account:
-                _logger.warning("No default income account found via ir.property, searching for fallback.")
-                default_account = self.env['account.account'].sudo().search([('account_type', '=', 'income')], limit=1)
-        except KeyError:
-            _logger.error("ir.property model not found, falling back to first income account.")
-            default_account = self.env['account.account'].sudo().search([('account_type', '=', 'income')], limit=1)
         moves = super(AccountMove, self).create(vals_list)
         for move in moves:
             analytic_id = self.env.user.analytic_account_ids and self.env.user.analytic_account_ids[0].id
@@ -164,7 +173,7 @@ class AccountMove(models.Model):
                     'name': 'Treatment Charge',
                     'quantity': 1,
                     'price_unit': 700.00,
-                    'account_id': default_account.id if default_account else False,
+                    'account_id': self.env['product.product']._vet_default_income_account_id() or False,
                     'analytic_distribution': {str(analytic_id): 100.0}
                 })]})
             elif analytic_id:
@@ -175,8 +184,77 @@ class AccountMove(models.Model):
             move._compute_analytic_display()
         return moves
 
+    def init(self):
+        super().init()
+        # Lets _dashboard_totals_stamp() find the latest change with a backward index scan
+        create_index(self._cr, 'account_move_write_date_index', self._table, ['write_date'])
+        # Open customer invoices scanned by the receivables aging view
+        create_index(
+            self._cr, 'account_move_vet_open_receivable_index', self._table, ['partner_id', 'analytic_account_id'],
+            where="move_type = 'out_invoice' AND state = 'posted' AND payment_state IN ('not_paid', 'partial')",
+        )
+
     def action_post(self):
-        return super().action_post()
+        before = self._vet_dashboard_snapshot()
+        res = super().action_post()
+        self._vet_refresh_reporting(before)
+        # Stock is delivered by the delivery queue cron, not while the cashier waits
+        self.env['vet.delivery.job']._enqueue(self)
+        return res
+
+    def button_draft(self):
+        before = self._vet_dashboard_snapshot()
+        res = super().button_draft()
+        self._vet_refresh_reporting(before)
+        return res
+
+    def button_cancel(self):
+        before = self._vet_dashboard_snapshot()
+        res = super().button_cancel()
+        self._vet_refresh_reporting(before)
+        return res
+
+    def _vet_refresh_reporting(self, before=None):
+        """Propagate posting/payment changes of these moves to the vet reporting tables.
+
+        :param before: optional ``_vet_dashboard_snapshot()`` taken before the
+            change; when given, the resulting tile deltas are pushed on the bus.
+        """
+        self.env['vet.revenue.daily']._refresh_moves(self)
+        self.env['vet.receivable.ledger']._refresh_partners(
+            self.filtered(lambda m: m.move_type == 'out_invoice').partner_id
+        )
+        self.env['vet.animal.visit']._sync_state_from_invoices(self)
+        if before is not None:
+            self._vet_publish_dashboard(before)
+
+    def _vet_dashboard_tiles(self, today):
+        """Contribution of this move to the dashboard tiles of its branch."""
+        self.ensure_one()
+        tiles = {}
+        if self.state != 'posted' or self.move_type not in ('out_invoice', 'out_refund'):
+            return tiles
+        if self.move_type == 'out_invoice':
+            tiles['paid_invoices' if self.payment_state == 'paid' else 'pending_invoices'] = 1
+        if self.invoice_date == today:
+            tiles['revenue_today'] = self.amount_total_signed
+            tiles['collected_today'] = self.amount_total_signed - self.amount_residual_signed
+        return tiles
+
+    def _vet_dashboard_snapshot(self):
+        today = fields.Date.context_today(self)
+        return {move.id: (move.analytic_account_id.id, move._vet_dashboard_tiles(today)) for move in self}
+
+    def _vet_publish_dashboard(self, before):
+        today = fields.Date.context_today(self)
+        deltas = defaultdict(lambda: defaultdict(float))
+        for move in self:
+            branch_id, tiles = before.get(move.id, (False, {}))
+            for tile, value in tiles.items():
+                deltas[branch_id][tile] -= value
+            for tile, value in move._vet_dashboard_tiles(today).items():
+                deltas[move.analytic_account_id.id][tile] += value
+        self.env['vet.dashboard']._publish_deltas(deltas)
 
     # ✅ FIXED read_group
     @api.model
@@ -186,34 +264,104 @@ class AccountMove(models.Model):
         if user_branches:
             branch_domain = [('analytic_account_id', 'in', user_branches.ids)]
             domain = expression.AND([domain or [], branch_domain])
-        
-        res = super().read_group(domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy)
-        all_records = self.search(domain)
-        totals = self._compute_global_totals(all_records)
-
-        for group in res:
-            if not group.get('__domain'):
-                continue
-            group_records = self.search(group['__domain'])
-            group_totals = self._compute_global_totals(group_records)
-            group.update({
-                'dashboard_total_cash': group_totals['dashboard_total_cash'],
-                'dashboard_total_bank': group_totals['dashboard_total_bank'],
-                'dashboard_total_online': group_totals['dashboard_total_online'],
-                'amount_total': sum(group_records.mapped('amount_total')) or 0.0,
-                '__count': len(group_records),
-            })
-        return res
 
-    def _compute_global_totals(self, records):
-        total_cash = sum(rec.amount_total for rec in records if (rec.payment_method or '').lower() == 'cash')
-        total_bank = sum(rec.amount_total for rec in records if (rec.payment_method or '').lower() == 'bank')
-        total_online = sum(rec.amount_total for rec in records if (rec.payment_method or '').lower() in ('online', 'credit', 'credit_card'))
-        return {
-            'dashboard_total_cash': total_cash,
-            'dashboard_total_bank': total_bank,
-            'dashboard_total_online': total_online,
+        # Payment method totals are aggregated in the same GROUP BY, see _read_group_select
+        fields = list(fields or [])
+        requested = {spec.split(':')[0] for spec in fields}
+        for fname in list(DASHBOARD_PAYMENT_METHODS) + ['amount_total']:
+            if fname not in requested:
+                fields.append(f'{fname}:sum')
+        return super().read_group(domain, fields, groupby, offset=offset, limit=limit, orderby=orderby, lazy=lazy)
+
+    @api.model
+    def _read_group_select(self, aggregate_spec, query):
+        fname, __, func = aggregate_spec.partition(':')
+        if fname in DASHBOARD_PAYMENT_METHODS and func == 'sum':
+            return SQL(
+                "COALESCE(SUM(%s) FILTER (WHERE LOWER(%s) IN %s), 0)",
+                self._field_to_sql(self._table, 'amount_total', query),
+                self._field_to_sql(self._table, 'payment_method', query),
+                DASHBOARD_PAYMENT_METHODS[fname],
+            )
+        if fname == 'dashboard_total_discount' and func == 'sum':
+            return SQL(
+                """COALESCE(SUM((
+                    SELECT SUM(line.price_unit * line.quantity * line.discount / 100.0)
+                    FROM account_move_line line
+                    WHERE line.move_id = %s
+                      AND line.display_type IN ('product', 'line_section', 'line_note')
+                )) FILTER (WHERE LOWER(%s) = 'cash'), 0)""",
+                self._field_to_sql(self._table, 'id', query),
+                self._field_to_sql(self._table, 'payment_method', query),
+            )
+        return super()._read_group_select(aggregate_spec, query)
+
+    # ===================== DASHBOARD TOTALS (BANNER) =====================
+    @api.model
+    def _get_dashboard_totals(self, domain):
+        """Totals for the invoice dashboard banner, computed in one aggregate query.
+
+        Results are cached per user, company set, branch set and normalized
+        domain. An entry is reused only while the latest ``write_date`` of the
+        invoices in the user's branches is unchanged; posting an invoice or
+        reconciling a payment against it rewrites the invoice and so
+        invalidates every cached domain of that scope.
+        """
+        branch_ids = tuple(sorted(self.env.user.analytic_account_ids.ids))
+        key = (
+            self.env.cr.dbname, self.env.uid, tuple(sorted(self.env.companies.ids)),
+            branch_ids, self._dashboard_domain_key(domain),
+        )
+        stamp = self._dashboard_totals_stamp(branch_ids)
+        cached = _DASHBOARD_TOTALS_CACHE.get(key)
+        if cached and cached[0] == stamp and cached[1] > time.time():
+            return dict(cached[2])
+
+        if branch_ids:
+            domain = expression.AND([domain or [], [('analytic_account_id', 'in', list(branch_ids))]])
+        [(count, total, residual, cash, bank, online, discount)] = self._read_group(
+            domain or [], [], [
+                '__count', 'amount_total:sum', 'amount_residual:sum',
+                'dashboard_total_cash:sum', 'dashboard_total_bank:sum',
+                'dashboard_total_online:sum', 'dashboard_total_discount:sum',
+            ],
+        )
+        totals = {
+            'invoice_count': count,
+            'dashboard_total_all': total or 0.0,
+            'amount_residual': residual or 0.0,
+            'dashboard_total_cash': cash or 0.0,
+            'dashboard_total_bank': bank or 0.0,
+            'dashboard_total_online': online or 0.0,
+            'dashboard_total_discount': discount or 0.0,
         }
+        # Hashed from the totals themselves: a recomputation after the TTL
+        # that the stamp did not see coming still gets a new tag
+        totals['etag'] = hashlib.sha1(repr((key, sorted(totals.items()))).encode()).hexdigest()
+        _DASHBOARD_TOTALS_CACHE[key] = (stamp, time.time() + DASHBOARD_TOTALS_TTL, totals)
+        return dict(totals)
+
+    @api.model
+    def _dashboard_domain_key(self, domain):
+        def freeze(value):
+            if isinstance(value, (list, tuple)):
+                return tuple(freeze(item) for item in value)
+            return value
+        return repr(freeze(expression.normalize_domain(list(domain or []))))
+
+    @api.model
+    def _dashboard_totals_stamp(self, branch_ids):
+        self.flush_model(['write_date', 'analytic_account_id'])
+        if branch_ids:
+            self._cr.execute("""
+                SELECT write_date FROM account_move
+                WHERE analytic_account_id IN %s
+                ORDER BY write_date DESC LIMIT 1
+            """, (branch_ids,))
+        else:
+            self._cr.execute("SELECT write_date FROM account_move ORDER BY write_date DESC LIMIT 1")
+        row = self._cr.fetchone()
+        return row and row[0]
 
     def action_print_visit_receipt_from_invoice(self):
         self.ensure_one()
@@ -261,6 +409,16 @@ class AccountMove(models.Model):
 class AccountPayment(models.Model):
     _inherit = 'account.payment'
 
+    visit_id = fields.Many2one(
+        'vet.animal.visit',
+        string="Visit",
+        index='btree_not_null',
+        ondelete='set null',
+        readonly=True,
+        copy=False,
+        help="Visit this payment was taken at."
+    )
+
     def action_post(self):
         res = super().action_post()
         for payment in self:
@@ -277,6 +435,12 @@ class AccountPayment(models.Model):
 class AccountAnalyticAccount(models.Model):
     _inherit = 'account.analytic.account'
     image = fields.Image(string="Image", max_width=128, max_height=128)
+    warehouse_id = fields.Many2one(
+        'stock.warehouse',
+        string="Warehouse",
+        help="Warehouse the products of this branch's visits are delivered from. "
+             "Defaults to the user's warehouse."
+    )
     
     # ✅ FIXED - NOW OPENS INVOICES FOR THIS BRANCH
     def action_open_register(self):
@@ -348,3 +512,18 @@ class AccountMoveLine(models.Model):
             user_accounts = self.env.user.analytic_account_ids
             return [('analytic_distribution', 'ilike', f'"{acc.id}":') for acc in user_accounts]
         return []
+
+    def reconcile(self):
+        moves = self.move_id
+        before = moves._vet_dashboard_snapshot()
+        res = super().reconcile()
+        moves._vet_refresh_reporting(before)
+        return res
+
+    def remove_move_reconcile(self):
+        partials = self.matched_debit_ids | self.matched_credit_ids
+        moves = self.move_id | partials.debit_move_id.move_id | partials.credit_move_id.move_id
+        before = moves._vet_dashboard_snapshot()
+        res = super().remove_move_reconcile()
+        moves._vet_refresh_reporting(before)
+        return res
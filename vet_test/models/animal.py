@@ -34,6 +34,7 @@ class VetAnimal(models.Model):
     owner_id = fields.Many2one('vet.animal.owner', string="Owner", tracking=True)
     contact_number = fields.Char(related='owner_id.contact_number', string="Owner Contact", store=True, readonly=True)
     image_1920 = fields.Image(string="Animal Image", max_width=1920, max_height=1920)
+    image_128 = fields.Image(string="Thumbnail", related='image_1920', max_width=128, max_height=128, store=True)
     active = fields.Boolean(string="Active", default=True)
     notes = fields.Text(string="Additional Notes")
     partner_id = fields.Many2one(
@@ -81,6 +81,12 @@ class VetAnimalHistoryWizard(models.TransientModel):
         visits = self.env['vet.animal.visit'].search(domain, order='date desc')
         _logger.info("Found %s visits for domain %s", len(visits), domain)
     
+        # Payments taken at each visit, through their indexed link to it
+        paid = dict(self.env['account.payment']._read_group(
+            [('visit_id', 'in', visits.ids), ('move_id.state', '=', 'posted')],
+            ['visit_id'], ['amount:sum'],
+        ))
+
         lines = []
         for visit in visits:
             service_lines = []
@@ -121,6 +127,7 @@ class VetAnimalHistoryWizard(models.TransientModel):
                 'doctor': visit.doctor_id.name,
                 'notes': visit.notes or '-',
                 'total_amount': visit.total_amount,
+                'amount_paid': paid.get(visit, 0.0),
                 'service_line_ids': service_lines,
             }
             lines.append((0, 0, line_vals))
@@ -154,6 +161,7 @@ class VetAnimalHistoryLine(models.TransientModel):
     doctor = fields.Char(string="Doctor")
     notes = fields.Text(string="Notes")
     total_amount = fields.Float(string="Total Amount")
+    amount_paid = fields.Float(string="Paid at Visit")
     service_line_ids = fields.One2many("vet.animal.history.service", "history_line_id", string="Services/Treatments")
     service_names = fields.Char(string="Services/Treatments", compute="_compute_service_names", store=False)
 
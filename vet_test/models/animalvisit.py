@@ -1,10 +1,22 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import create_index
+from ..tools import metrics
+from collections import defaultdict
+from datetime import datetime, time, timedelta
 import logging
+import pytz
 import uuid
 
 _logger = logging.getLogger(__name__)
 
+# States shown on the waiting room queue board (and counted as open visits)
+QUEUE_STATES = ('draft', 'confirmed')
+# Fields that can move a visit on or off a queue board
+QUEUE_TRACKED_FIELDS = {'state', 'analytic_account_id', 'doctor_id', 'date', 'animal_id', 'owner_id'}
+# Bus notification type carrying {'branch_id': id, 'rows': [...], 'removed': [ids]}
+BUS_QUEUE_UPDATE = 'vet_test.queue/update'
+
 class VetAnimalVisit(models.Model):
     _name = "vet.animal.visit"
     _inherit = ['mail.thread', 'mail.activity.mixin']
@@ -24,6 +36,15 @@ class VetAnimalVisit(models.Model):
     owner_id = fields.Many2one('vet.animal.owner', string="Owner")
     contact_number = fields.Char(string="Owner Contact")
     doctor_id = fields.Many2one("vet.animal.doctor", string="Doctor")
+    analytic_account_id = fields.Many2one(
+        'account.analytic.account',
+        string="Branch",
+        compute='_compute_analytic_account_id',
+        store=True,
+        readonly=False,
+        precompute=True,
+        index=True
+    )
     notes = fields.Text("Notes")
     treatment_charge = fields.Float(default=0.0)
     discount_percent = fields.Float(string="Discount (%)", default=0.0)
@@ -44,19 +65,20 @@ class VetAnimalVisit(models.Model):
     )
 
     line_ids = fields.One2many('vet.animal.visit.line', 'visit_id', string="Visit Lines")
+    # Per-type tabs over line_ids, split in memory on the stored line type
     medicine_line_ids = fields.One2many(
         'vet.animal.visit.line', 'visit_id',
-        domain=[('service_id.service_type', '=', 'vaccine')],
+        compute='_compute_typed_line_ids', inverse='_inverse_medicine_line_ids',
         string="Medicine Lines"
     )
     service_line_ids = fields.One2many(
         'vet.animal.visit.line', 'visit_id',
-        domain=[('service_id.service_type', '=', 'service')],
+        compute='_compute_typed_line_ids', inverse='_inverse_service_line_ids',
         string="Service Lines"
     )
     test_line_ids = fields.One2many(
         'vet.animal.visit.line', 'visit_id',
-        domain=[('service_id.service_type', '=', 'test')],
+        compute='_compute_typed_line_ids', inverse='_inverse_test_line_ids',
         string="Test Lines"
     )
     receipt_lines = fields.One2many(
@@ -73,13 +95,20 @@ class VetAnimalVisit(models.Model):
     has_unpaid_invoice = fields.Boolean(
         string="Has Unpaid Invoice",
         compute="_compute_has_unpaid_invoice",
-        store=True
     )
     state = fields.Selection(
         [('draft', 'Draft'), ('confirmed', 'Confirmed'), ('done', 'Done'), ('cancel', 'Cancelled')],
         default='draft'
     )
     delivered = fields.Boolean(default=False, string="Products Delivered")
+    delivery_job_ids = fields.One2many('vet.delivery.job', 'visit_id', string="Delivery Jobs")
+    payment_ids = fields.One2many('account.payment', 'visit_id', string="Payments")
+    delivery_state = fields.Selection([
+        ('none', 'Nothing to Deliver'),
+        ('pending', 'Delivery Pending'),
+        ('done', 'Delivered'),
+        ('failed', 'Delivery Failed'),
+    ], string="Delivery Status", compute='_compute_delivery_state', store=True)
     amount_received = fields.Float(compute='_compute_amount_received')
     latest_payment_amount = fields.Float(
         string="Latest Payment Amount",
@@ -101,18 +130,17 @@ class VetAnimalVisit(models.Model):
 
     @api.depends('owner_id.partner_id')
     def _compute_has_unpaid_invoice(self):
-        AccountMove = self.env['account.move']
+        balances = self.env['vet.receivable.ledger']._get_balances(self.owner_id.partner_id)
         for visit in self:
-            has_unpaid = False
-            partner = visit.owner_id.partner_id
-            if partner:
-                unpaid = AccountMove.search_count([
-                    ('partner_id', '=', partner.id),
-                    ('move_type', '=', 'out_invoice'),
-                    ('payment_state', 'in', ['not_paid', 'partial']),
-                ])
-                has_unpaid = unpaid > 0
-            visit.has_unpaid_invoice = has_unpaid
+            visit.has_unpaid_invoice = bool(balances.get(visit.owner_id.partner_id.id, (0.0, 0))[1])
+
+    @api.depends('doctor_id')
+    def _compute_analytic_account_id(self):
+        default_branch = self.env.user.analytic_account_ids[:1]
+        for visit in self:
+            visit.analytic_account_id = (
+                visit.doctor_id.analytic_account_id or visit.analytic_account_id or default_branch
+            )
 
     @api.depends('payment_state')
     def _compute_is_fully_paid(self):
@@ -157,16 +185,48 @@ class VetAnimalVisit(models.Model):
                 animals = self.env['vet.animal'].browse()
             record.animal_ids = animals
 
+    @api.depends('line_ids.service_type')
+    def _compute_typed_line_ids(self):
+        for visit in self:
+            lines = visit.line_ids
+            visit.service_line_ids = lines.filtered(lambda line: line.service_type == 'service')
+            visit.test_line_ids = lines.filtered(lambda line: line.service_type == 'test')
+            visit.medicine_line_ids = lines.filtered(lambda line: line.service_type == 'vaccine')
+
+    def _set_typed_lines(self, service_type, field_name):
+        """Make ``line_ids`` follow an edited type tab: lines removed from the
+        tab are deleted, the others are kept."""
+        new_lines = self[0][field_name]
+        for visit in self:
+            old_lines = visit.line_ids.filtered(lambda line: line.service_type == service_type)
+            visit.line_ids = (visit.line_ids - old_lines) | new_lines
+            lines_to_unlink = old_lines - new_lines
+            if lines_to_unlink:
+                lines_to_unlink.unlink()
+
+    def _inverse_service_line_ids(self):
+        self._set_typed_lines('service', 'service_line_ids')
+
+    def _inverse_test_line_ids(self):
+        self._set_typed_lines('test', 'test_line_ids')
+
+    def _inverse_medicine_line_ids(self):
+        self._set_typed_lines('vaccine', 'medicine_line_ids')
+
     @api.depends(
-        'service_line_ids.quantity', 'service_line_ids.price_unit',
-        'test_line_ids.quantity', 'test_line_ids.price_unit',
-        'medicine_line_ids.quantity', 'medicine_line_ids.price_unit',
+        'line_ids.service_type', 'line_ids.quantity', 'line_ids.price_unit',
         'treatment_charge', 'discount_percent', 'discount_fixed'
     )
     def _compute_totals(self):
+        # Records being edited in a form (NewId) keep the in-memory sum
+        stored = self.filtered('id')
+        subtotals = stored._get_line_subtotals() if stored else {}
         for visit in self:
-            all_lines = visit.service_line_ids + visit.test_line_ids + visit.medicine_line_ids
-            subtotal = sum(line.quantity * line.price_unit for line in all_lines if line.quantity and line.price_unit)
+            if visit in stored:
+                subtotal = subtotals.get(visit.id, 0)
+            else:
+                all_lines = visit.service_line_ids + visit.test_line_ids + visit.medicine_line_ids
+                subtotal = sum(line.quantity * line.price_unit for line in all_lines if line.quantity and line.price_unit)
             visit.subtotal = subtotal
             total = subtotal + (visit.treatment_charge or 0.0)
             if visit.discount_percent > 0:
@@ -174,9 +234,31 @@ class VetAnimalVisit(models.Model):
             elif visit.discount_fixed > 0:
                 total -= visit.discount_fixed
             visit.total_amount = float(total or 0.0)
-            _logger.info("Visit %s: Computed totals fixed - subtotal=%s, total_amount=%s", visit.name, visit.subtotal, visit.total_amount)
 
-    @api.depends('service_line_ids.quantity', 'service_line_ids.price_unit', 'test_line_ids.quantity', 'test_line_ids.price_unit', 'medicine_line_ids.quantity', 'medicine_line_ids.price_unit')
+    def _get_line_subtotals(self):
+        """{visit id: sum of quantity * price_unit} over the service, test and
+        vaccine lines of the visits, in one grouped query.
+
+        The factors come back in the order the One2many fields would give
+        them (service, test then vaccine lines, each by id) and are summed in
+        Python, so the result is bit-for-bit the per-record computation.
+        """
+        self.env['vet.animal.visit.line'].flush_model(['visit_id', 'service_type', 'quantity', 'price_unit'])
+        self._cr.execute("""
+            SELECT l.visit_id,
+                   array_agg(l.quantity ORDER BY l.service_type = 'service' DESC, l.service_type = 'test' DESC, l.id),
+                   array_agg(l.price_unit ORDER BY l.service_type = 'service' DESC, l.service_type = 'test' DESC, l.id)
+            FROM vet_animal_visit_line l
+            WHERE l.visit_id IN %s AND l.service_type IN ('service', 'test', 'vaccine')
+            GROUP BY l.visit_id
+        """, (tuple(self.ids),))
+        return {
+            visit_id: sum(quantity * price_unit for quantity, price_unit in zip(quantities, price_units)
+                          if quantity and price_unit)
+            for visit_id, quantities, price_units in self._cr.fetchall()
+        }
+
+    @api.depends('line_ids.service_type', 'line_ids.quantity', 'line_ids.price_unit', 'line_ids.product_id')
     def _compute_receipt_lines(self):
         for visit in self:
             all_lines = visit.service_line_ids + visit.test_line_ids + visit.medicine_line_ids
@@ -201,28 +283,19 @@ class VetAnimalVisit(models.Model):
                 else:
                     visit.payment_state = 'not_paid'
 
-            old_state = visit.state
-            new_state = visit.state
-
-            if old_state == 'cancel':
-                continue
-
-            if visit.payment_state == 'paid':
-                new_state = 'done'
-            elif visit.invoice_ids:
-                new_state = 'confirmed'
+    @api.depends('delivered', 'delivery_job_ids.state')
+    def _compute_delivery_state(self):
+        for visit in self:
+            if visit.delivered:
+                visit.delivery_state = 'done'
             else:
-                new_state = 'draft'
-
-            if new_state != old_state:
-                visit.with_context(skip_visit_validation=True).write({'state': new_state})
-                _logger.info("Visit %s: State sync: %s -> %s (payment_state=%s)",
-                             visit.name, old_state, new_state, visit.payment_state)
+                visit.delivery_state = visit.delivery_job_ids.sorted('id')[-1:].state or 'none'
 
     @api.depends("owner_id")
     def _compute_owner_unpaid_balance(self):
+        balances = self.env['vet.receivable.ledger']._get_balances(self.owner_id.partner_id)
         for visit in self:
-            visit.owner_unpaid_balance = visit._get_owner_unpaid_balance()
+            visit.owner_unpaid_balance = balances.get(visit.owner_id.partner_id.id, (0.0, 0))[0]
 
     def action_confirm(self):
         for visit in self:
@@ -240,18 +313,33 @@ class VetAnimalVisit(models.Model):
                 _logger.info("Visit %s: Cancelled, state set to 'cancel'", visit.name)
                 visit.message_post(body=_("Visit cancelled."))
 
+    def init(self):
+        super().init()
+        # Queue board: today's visits of one branch in arrival order
+        create_index(self._cr, 'vet_animal_visit_branch_date_index', self._table, ['analytic_account_id', 'date'])
+        # Incremental analytics export: keyset scan on (write_date, id)
+        create_index(self._cr, 'vet_animal_visit_write_date_id_index', self._table, ['write_date', 'id'])
+
     @api.model
     def create(self, vals):
         if vals.get("name", _("New")) == _("New"):
             vals["name"] = self.env["ir.sequence"].next_by_code("vet.animal.visit") or "VIS00000"
-        return super().create(vals)
+        visit = super().create(vals)
+        visit._vet_publish_dashboard({})
+        return visit
+
+    def unlink(self):
+        before = self._vet_dashboard_snapshot()
+        res = super().unlink()
+        self.browse()._vet_publish_dashboard(before)
+        return res
 
     def write(self, vals):
         if self.env.context.get('skip_visit_validation') or self.env.context.get('from_payment_wizard'):
-            return super().write(vals)
+            return self._write_tracked(vals)
 
         if set(vals.keys()).issubset(['is_fully_paid', 'notes', 'latest_payment_amount']):
-            return super().write(vals)
+            return self._write_tracked(vals)
 
         for visit in self:
             if visit.state in ['confirmed', 'done']:
@@ -307,7 +395,118 @@ class VetAnimalVisit(models.Model):
                               ', '.join(allowed_fields) or 'no fields'
                           )
                     )
-        return super().write(vals)
+        return self._write_tracked(vals)
+
+    def _write_tracked(self, vals):
+        """Write and publish the dashboard/queue updates of visits whose board position changes."""
+        if not QUEUE_TRACKED_FIELDS & set(vals):
+            return super().write(vals)
+        before = self._vet_dashboard_snapshot()
+        res = super().write(vals)
+        self._vet_publish_dashboard(before)
+        return res
+
+    def _vet_dashboard_snapshot(self):
+        return {visit.id: (visit.analytic_account_id.id, visit.state) for visit in self}
+
+    def _vet_publish_dashboard(self, before):
+        """Send the open visit deltas and queue board updates since ``before`` on the bus."""
+        deltas = defaultdict(lambda: defaultdict(int))
+        for branch_id, state in before.values():
+            if state in QUEUE_STATES:
+                deltas[branch_id]['open_visits'] -= 1
+        for visit in self:
+            if visit.state in QUEUE_STATES:
+                deltas[visit.analytic_account_id.id]['open_visits'] += 1
+        self.env['vet.dashboard']._publish_deltas(deltas)
+
+        # Queue boards: upsert rows still queued today, remove the others
+        rows = {row['id']: row for row in self._read_queue_rows(ids=self.ids)} if self else {}
+        updates = defaultdict(lambda: {'rows': [], 'removed': []})
+        for visit_id, (branch_id, __) in before.items():
+            row = rows.get(visit_id)
+            if branch_id and (not row or row['branch_id'] != branch_id):
+                updates[branch_id]['removed'].append(visit_id)
+        for visit in self:
+            if visit.id in rows:
+                updates[visit.analytic_account_id.id]['rows'].append(rows[visit.id])
+            elif visit.analytic_account_id and visit.id not in before:
+                continue
+            elif visit.analytic_account_id:
+                updates[visit.analytic_account_id.id]['removed'].append(visit.id)
+        branches = self.env['account.analytic.account'].browse([bid for bid in updates if bid]).exists()
+        notifications = [
+            (branch, BUS_QUEUE_UPDATE, dict(updates[branch.id], branch_id=branch.id))
+            for branch in branches
+        ]
+        if notifications:
+            self.env['bus.bus'].sudo()._sendmany(notifications)
+
+    # ===================== WAITING ROOM QUEUE =====================
+    @api.model
+    def _queue_day_bounds(self):
+        """Today's [start, end) in UTC for the user's timezone."""
+        tz = pytz.timezone(self.env.context.get('tz') or self.env.user.tz or 'UTC')
+        start = tz.localize(datetime.combine(fields.Date.context_today(self), time.min))
+        start = start.astimezone(pytz.utc).replace(tzinfo=None)
+        return start, start + timedelta(days=1)
+
+    @api.model
+    def _read_queue_rows(self, branch_id=None, ids=None):
+        """Lean rows of today's draft/confirmed visits, in arrival order.
+
+        Only the columns the board shows are selected (no images: cards load
+        a cached thumbnail URL instead).
+        """
+        self.flush_model(['name', 'date', 'state', 'analytic_account_id', 'doctor_id', 'animal_id', 'owner_id'])
+        self.env['vet.animal'].flush_model(['name'])
+        start, end = self._queue_day_bounds()
+        where, params = [], [QUEUE_STATES, start, end]
+        if branch_id:
+            where.append("AND v.analytic_account_id = %s")
+            params.append(branch_id)
+        if ids is not None:
+            where.append("AND v.id IN %s")
+            params.append(tuple(ids) or (0,))
+        self._cr.execute(f"""
+            SELECT v.id, v.name, v.date, v.state, v.analytic_account_id,
+                   v.doctor_id, d.name, v.animal_id, a.name, a.write_date, o.name
+            FROM vet_animal_visit v
+            LEFT JOIN vet_animal_doctor d ON d.id = v.doctor_id
+            LEFT JOIN vet_animal a ON a.id = v.animal_id
+            LEFT JOIN vet_animal_owner o ON o.id = v.owner_id
+            WHERE v.state IN %s AND v.date >= %s AND v.date < %s
+            {' '.join(where)}
+            ORDER BY v.date, v.id
+        """, params)
+        return [{
+            'id': visit_id,
+            'name': name,
+            'date': fields.Datetime.to_string(date),
+            'state': state,
+            'branch_id': branch,
+            'doctor_id': doctor_id or False,
+            'doctor_name': doctor_name or _("No doctor"),
+            'animal_name': animal_name or '',
+            'owner_name': owner_name or '',
+            'thumbnail': animal_id and '/web/image/vet.animal/%s/image_128?unique=%s' % (
+                animal_id, int(animal_write_date.timestamp()) if animal_write_date else 0
+            ),
+        } for (visit_id, name, date, state, branch, doctor_id, doctor_name,
+               animal_id, animal_name, animal_write_date, owner_name) in self._cr.fetchall()]
+
+    @api.model
+    def _get_queue_board(self, branch_id=None):
+        branches = self.env.user.analytic_account_ids
+        if not branches:
+            branches = self.env['account.analytic.account'].search([])
+        if branch_id not in branches.ids:
+            branch_id = branches[:1].id
+        return {
+            'branch_id': branch_id,
+            'branches': [{'id': branch.id, 'name': branch.display_name} for branch in branches],
+            'rows': self._read_queue_rows(branch_id=branch_id) if branch_id else [],
+        }
 
     def print_visit_receipt(self):
         return self.env.ref('vet_test.action_report_visit_receipt').report_action(self)
@@ -378,56 +577,59 @@ class VetAnimalVisit(models.Model):
         self.ensure_one()
         return self.env.ref("vet_test.action_report_visit_receipt").report_action(self)
 
+    def _get_synced_state(self):
+        """State the visit should be in given its invoices; cancelled visits keep theirs."""
+        self.ensure_one()
+        if self.state == 'cancel':
+            return 'cancel'
+        if self.payment_state == 'paid':
+            return 'done'
+        return 'confirmed' if self.invoice_ids else 'draft'
+
     def _sync_state_with_payment(self):
+        """Align the visits' state with their invoices, one write per target state."""
+        targets = defaultdict(list)
         for visit in self:
-            if visit.state == "cancel":
-                continue
-            new_state = 'draft'
-            if visit.payment_state == "paid":
-                new_state = "done"
-            elif visit.invoice_ids:
-                new_state = "confirmed"
-            else:
-                new_state = 'draft'
-
+            new_state = visit._get_synced_state()
             if new_state != visit.state:
-                visit.with_context(skip_visit_validation=True).write({'state': new_state})
-                _logger.info("Visit %s: State synced to %s (payment_state=%s)",
-                             visit.name, new_state, visit.payment_state)
+                targets[new_state].append(visit.id)
+        for new_state, visit_ids in targets.items():
+            self.browse(visit_ids).with_context(skip_visit_validation=True).write({'state': new_state})
+            _logger.info("State synced to %s for %s visit(s)", new_state, len(visit_ids))
 
-    @api.constrains('payment_state', 'state')
-    def _constrain_payment_state(self):
-        for visit in self:
-            if visit.state not in ['draft', 'cancel']:
-                expected_state = 'done' if visit.payment_state == 'paid' else 'confirmed'
-                if visit.state != expected_state:
-                    visit.with_context(skip_visit_validation=True).write({'state': expected_state})
-                    _logger.info("Visit %s: Constrained state to %s due to payment_state=%s",
-                                 visit.name, expected_state, visit.payment_state)
+    @api.model
+    def _sync_state_from_invoices(self, invoices):
+        """Sync the visits of ``invoices`` after their posting or payment state changed."""
+        invoices = invoices.filtered(lambda m: m.move_type in ('out_invoice', 'out_refund'))
+        if not invoices:
+            return
+        self.env['account.move'].flush_model(['visit_id'])
+        self._cr.execute("""
+            SELECT DISTINCT visit_id FROM account_move
+            WHERE id IN %s AND visit_id IS NOT NULL
+        """, (tuple(invoices.ids),))
+        visits = self.browse([row[0] for row in self._cr.fetchall()])
+        visits._sync_state_with_payment()
 
     def _get_owner_unpaid_balance(self, exclude_visits=None):
         self.ensure_one()
-        if not self.owner_id or not self.owner_id.partner_id:
-            _logger.info("Visit %s: No owner_id or partner_id found, returning 0.0", self.name)
+        partner = self.owner_id.partner_id
+        if not partner:
             return 0.0
 
-        self.env["account.move"].invalidate_model(["amount_residual", "payment_state"])
+        if not exclude_visits:
+            return self.env['vet.receivable.ledger']._get_balances(partner).get(partner.id, (0.0, 0))[0]
 
         domain = [
-            ("partner_id", "=", self.owner_id.partner_id.id),
+            ("partner_id", "=", partner.id),
             ("move_type", "=", "out_invoice"),
             ("state", "=", "posted"),
             ("payment_state", "in", ["not_paid", "partial"]),
+            ("visit_id", "not in", exclude_visits),
         ]
-
-        if exclude_visits:
-            domain.append(("visit_id", "not in", exclude_visits))
-
         invoices = self.env["account.move"].search(domain)
-        balance = sum(invoices.mapped('amount_residual'))
-        _logger.info("Visit %s: Calculated unpaid balance: %s for invoices %s",
-                     self.name, balance, invoices.mapped('name'))
-        return balance
+        invoices.invalidate_recordset(["amount_residual"])
+        return sum(invoices.mapped('amount_residual'))
 
     def _get_or_create_partner_from_owner(self, owner):
         if owner.partner_id:
@@ -446,48 +648,132 @@ class VetAnimalVisit(models.Model):
             if visit.discount_percent > 0 and visit.discount_fixed > 0:
                 raise ValidationError(_("You cannot use both Discount (%) and Discount (Fixed) at the same time. Please use only one."))
 
-    def action_create_invoice(self):
-        for visit in self:
-            if visit.invoice_ids:
-                raise UserError(_("An invoice already exists for this visit."))
+    def _needs_combo_selection(self):
+        self.ensure_one()
+        return self.test_line_ids.filtered(lambda l: l.product_id and l.quantity > 0 and l.service_id.is_combo)
 
-            if not visit.owner_id:
-                raise UserError(_("Please set an owner before creating an invoice."))
+    def _prepare_invoice_vals(self, default_account_id=False):
+        """Values of the customer invoice of this visit; raises UserError when it cannot be invoiced."""
+        self.ensure_one()
+        visit = self
+        if visit.invoice_ids:
+            raise UserError(_("An invoice already exists for this visit."))
 
-            partner = visit._get_or_create_partner_from_owner(visit.owner_id)
-            if not partner:
-                raise UserError(_("Could not create a partner for the owner."))
+        if not visit.owner_id:
+            raise UserError(_("Please set an owner before creating an invoice."))
 
-            invoice_lines = []
-            first_account_id = False
+        partner = visit._get_or_create_partner_from_owner(visit.owner_id)
+        if not partner:
+            raise UserError(_("Could not create a partner for the owner."))
+
+        Product = self.env['product.product']
+        invoice_lines = []
+        first_account_id = default_account_id
+
+        for line in visit.service_line_ids + visit.test_line_ids + visit.medicine_line_ids:
+            prod, qty, price = line.product_id, line.quantity or 1.0, line.price_unit or 0.0
+            if not prod or not qty or not price:
+                _logger.warning(
+                    "Visit %s: Skipping line %s (type=%s, product=%s, qty=%s, price=%s) due to invalid product/qty/price",
+                    visit.name, line.id, line.service_id.service_type, prod.display_name if prod else 'None', qty, price
+                )
+                continue
 
-            Account = self.env['account.account']
-            if 'account_type' in Account._fields:
-                income_account = Account.search([('account_type', '=', 'income')], limit=1)
-            else:
-                income_account = Account.search([('user_type_id.type', '=', 'income')], limit=1)
-            if income_account:
-                first_account_id = income_account.id
-
-            def _get_income_account_for_product(product):
-                if not product:
-                    return None
-                tmpl = product.product_tmpl_id
-                return (
-                    product.property_account_income_id.id
-                    or (tmpl.property_account_income_id.id if tmpl and tmpl.property_account_income_id else False)
-                    or (
-                        tmpl.categ_id.property_account_income_categ_id.id
-                        if tmpl and tmpl.categ_id and tmpl.categ_id.property_account_income_categ_id
-                        else False
-                    )
+            account_id, tax_ids = Product._vet_invoice_accounting(prod.id)
+            account_id = account_id or first_account_id
+            if not account_id:
+                _logger.error("Visit %s: No income account for product %s, using fallback account if available", visit.name, prod.display_name)
+                raise UserError(
+                    _("Please configure an Income Account for product %s.") % (prod.display_name)
                 )
 
-            all_visit_lines = visit.service_line_ids + visit.test_line_ids + visit.medicine_line_ids
+            if not first_account_id:
+                first_account_id = account_id
+
+            discount_val = visit.discount_percent if visit.discount_percent > 0 else 0.0
+
+            invoice_lines.append((0, 0, {
+                'product_id': prod.id,
+                'name': prod.display_name,
+                'quantity': qty,
+                'price_unit': price,
+                'account_id': account_id,
+                'tax_ids': [(6, 0, list(tax_ids))],
+                'discount': discount_val,
+            }))
+            _logger.debug("Invoice line: product=%s, qty=%s, price=%s, discount=%s, account=%s",
+                          prod.display_name, qty, price, discount_val, account_id)
+
+        if visit.treatment_charge and float(visit.treatment_charge) != 0.0:
+            if not first_account_id:
+                raise UserError(_("Cannot determine an income account for Treatment Charge."))
+            invoice_lines.append((0, 0, {
+                'product_id': False,
+                'name': _("Treatment Charge"),
+                'quantity': 1.0,
+                'price_unit': float(visit.treatment_charge),
+                'account_id': first_account_id,
+                'tax_ids': [(6, 0, [])],
+            }))
+            _logger.debug("Invoice line for treatment charge: qty=1.0, price=%s", visit.treatment_charge)
+
+        if visit.discount_fixed > 0:
+            if not first_account_id:
+                raise UserError(_("Please configure an Income Account for discounts."))
+            invoice_lines.append((0, 0, {
+                'product_id': False,
+                'name': _("Discount (Fixed)"),
+                'quantity': 1.0,
+                'price_unit': -float(visit.discount_fixed),
+                'account_id': first_account_id,
+                'tax_ids': [(6, 0, [])],
+            }))
+            _logger.debug("Invoice line for fixed discount: qty=1.0, price=%s", -float(visit.discount_fixed))
+
+        if not invoice_lines:
+            raise UserError(_("No invoiceable lines found for this visit. To pay previous balances, use the Complete Payment action."))
+
+        return {
+            'partner_id': partner.id,
+            'move_type': 'out_invoice',
+            'invoice_line_ids': invoice_lines,
+            'invoice_date': fields.Date.context_today(self),
+            'invoice_origin': visit.name,
+            'visit_id': visit.id,
+        }
 
-            test_lines = visit.test_line_ids.filtered(lambda l: l.product_id and l.quantity > 0 and l.service_id.is_combo)
+    def _post_invoices(self, invoices):
+        """Post ``invoices`` at once; when the batch is refused, post them one
+        by one and return {visit: error} for the invoices that failed."""
+        failures = {}
+        try:
+            with self.env.cr.savepoint():
+                invoices.action_post()
+            return failures
+        except (UserError, ValidationError) as e:
+            _logger.warning("Batch posting of %s invoice(s) failed, posting one by one: %s", len(invoices), e)
+        for invoice in invoices:
+            try:
+                with self.env.cr.savepoint():
+                    invoice.action_post()
+            except (UserError, ValidationError) as e:
+                failures[invoice.visit_id] = str(e)
+        failed = invoices.filtered(lambda m: m.visit_id in failures)
+        if failed:
+            failed.unlink()
+        return failures
+
+    @metrics.instrument('create_invoice')
+    def action_create_invoice(self):
+        """Invoice the visits in one batch: one create and one post for all of them.
+
+        A visit that cannot be invoiced is reported and left as it was; the
+        others are invoiced anyway. A single visit raises its error instead.
+        """
+        if len(self) == 1:
+            test_lines = self._needs_combo_selection()
             if test_lines:
-                _logger.info("Visit %s: Combo test products detected, opening combo selection wizard", visit.name)
+                _logger.info("Visit %s: Combo test products detected, opening combo selection wizard", self.name)
                 return {
                     'name': _("Select Combo Components"),
                     'type': 'ir.actions.act_window',
@@ -495,119 +781,107 @@ class VetAnimalVisit(models.Model):
                     'view_mode': 'form',
                     'target': 'new',
                     'context': {
-                        'default_visit_id': visit.id,
+                        'default_visit_id': self.id,
                         'default_test_line_ids': test_lines.ids,
                     },
                 }
 
-            for line in all_visit_lines:
-                prod, qty, price = line.product_id, line.quantity or 1.0, line.price_unit or 0.0
-                if not prod or not qty or not price:
-                    _logger.warning(
-                        "Visit %s: Skipping line %s (type=%s, product=%s, qty=%s, price=%s) due to invalid product/qty/price",
-                        visit.name, line.id, line.service_id.service_type, prod.display_name if prod else 'None', qty, price
-                    )
-                    continue
-
-                account_id = _get_income_account_for_product(prod) or first_account_id
-                if not account_id:
-                    _logger.error("Visit %s: No income account for product %s, using fallback account if available", visit.name, prod.display_name)
-                    if not first_account_id:
-                        raise UserError(
-                            _("Please configure an Income Account for product %s.") % (prod.display_name)
-                        )
-                    account_id = first_account_id
-
-                if not first_account_id:
-                    first_account_id = account_id
-
-                discount_val = visit.discount_percent if visit.discount_percent > 0 else 0.0
-
-                invoice_lines.append((0, 0, {
-                    'product_id': prod.id,
-                    'name': prod.display_name,
-                    'quantity': qty,
-                    'price_unit': price,
-                    'account_id': account_id,
-                    'tax_ids': [(6, 0, prod.taxes_id.ids)],
-                    'discount': discount_val,
-                }))
-                _logger.debug("Invoice line: product=%s, qty=%s, price=%s, discount=%s, account=%s",
-                             prod.display_name, qty, price, discount_val, account_id)
-
-            if visit.treatment_charge and float(visit.treatment_charge) != 0.0:
-                if not first_account_id:
-                    raise UserError(_("Cannot determine an income account for Treatment Charge."))
-                invoice_lines.append((0, 0, {
-                    'product_id': False,
-                    'name': _("Treatment Charge"),
-                    'quantity': 1.0,
-                    'price_unit': float(visit.treatment_charge),
-                    'account_id': first_account_id,
-                    'tax_ids': [(6, 0, [])],
-                }))
-                _logger.debug("Invoice line for treatment charge: qty=1.0, price=%s", visit.treatment_charge)
-
-            if visit.discount_fixed > 0:
-                if not first_account_id:
-                    raise UserError(_("Please configure an Income Account for discounts."))
-                invoice_lines.append((0, 0, {
-                    'product_id': False,
-                    'name': _("Discount (Fixed)"),
-                    'quantity': 1.0,
-                    'price_unit': -float(visit.discount_fixed),
-                    'account_id': first_account_id,
-                    'tax_ids': [(6, 0, [])],
-                }))
-                _logger.debug("Invoice line for fixed discount: qty=1.0, price=%s", -float(visit.discount_fixed))
-
-            if not invoice_lines:
-                raise UserError(_("No invoiceable lines found for this visit. To pay previous balances, use the Complete Payment action."))
-
-            invoice_vals = {
-                'partner_id': partner.id,
-                'move_type': 'out_invoice',
-                'invoice_line_ids': invoice_lines,
-                'invoice_date': fields.Date.context_today(self),
-                'invoice_origin': visit.name,
-                'visit_id': visit.id,
+        default_account_id = self.env['product.product']._vet_default_income_account_id()
+        failures = {}
+        vals_list = []
+        for visit in self:
+            if visit._needs_combo_selection():
+                failures[visit] = _("Combo test components must be selected from the visit form.")
+                continue
+            try:
+                vals_list.append(visit._prepare_invoice_vals(default_account_id))
+            except UserError as e:
+                failures[visit] = str(e)
+        if len(self) == 1 and failures:
+            raise UserError(failures[self])
+
+        invoices = self.env['account.move'].create(vals_list)
+        missing_account_lines = invoices.invoice_line_ids.filtered(lambda l: not l.account_id)
+        for invoice in missing_account_lines.move_id:
+            fallback = invoice.invoice_line_ids.filtered('account_id')[:1].account_id.id
+            if fallback:
+                missing_account_lines.filtered(lambda l: l.move_id == invoice).write({'account_id': fallback})
+            else:
+                failures[invoice.visit_id] = _("Invoice created but some lines have no account. Configure income accounts.")
+        unaccounted = invoices.filtered(lambda m: m.visit_id in failures)
+        if unaccounted:
+            unaccounted.unlink()
+            invoices -= unaccounted
+
+        post_failures = self._post_invoices(invoices)
+        failures.update(post_failures)
+        invoices = invoices.exists()
+        if len(self) == 1 and failures:
+            raise UserError(failures[self])
+
+        # invoice_ids is the inverse of visit_id: the invoices are linked already
+        invoiced_visits = invoices.visit_id
+        invoiced_visits.with_context(skip_visit_validation=True)._sync_state_with_payment()
+        _logger.info("Invoiced %s visit(s) in one batch, %s failed", len(invoiced_visits), len(failures))
+        for visit, error in failures.items():
+            _logger.warning("Visit %s: Invoice not created: %s", visit.name, error)
+
+        if len(self) == 1:
+            return True
+        message = _("%s visit(s) invoiced.") % len(invoiced_visits)
+        if failures:
+            message += "\n" + "\n".join("%s: %s" % (visit.name, error) for visit, error in failures.items())
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Batch Invoicing"),
+                'message': message,
+                'type': 'warning' if failures else 'success',
+                'sticky': bool(failures),
             }
-            invoice = self.env['account.move'].create(invoice_vals)
-
-            missing_account_lines = invoice.invoice_line_ids.filtered(lambda l: not l.account_id)
-            if missing_account_lines:
-                fallback = invoice.invoice_line_ids.filtered('account_id')[:1].account_id.id
-                if fallback:
-                    missing_account_lines.write({'account_id': fallback})
-                else:
-                    raise UserError(_("Invoice created but some lines have no account. Configure income accounts."))
+        }
 
-            invoice.action_post()
-            visit.with_context(skip_visit_validation=True).write({'invoice_ids': [(4, invoice.id)]})
-            _logger.info("Invoice %s created and posted for visit %s", invoice.name, visit.name)
-            visit.with_context(skip_visit_validation=True)._sync_state_with_payment()
+    def _get_delivery_company(self):
+        """Company of the visit: the branch's, else the one it was invoiced in."""
+        self.ensure_one()
+        return (
+            self.analytic_account_id.company_id
+            or self.invoice_ids.filtered(lambda m: m.state == 'posted')[:1].company_id
+            or self.env.company
+        )
 
-            # Process delivery for all products (medicine and test lines)
-            deliverable_lines = visit.line_ids.filtered(
-                lambda l: l.product_id and l.quantity > 0
-            )
-            if deliverable_lines:
-                try:
-                    visit.action_deliver_products()
-                    _logger.info("Visit %s: All product delivery processed successfully", visit.name)
-                except Exception as e:
-                    _logger.warning("Visit %s: Product delivery failed, proceeding with invoice creation: %s", visit.name, str(e).replace('_', 'underscore'))
+    def _get_delivery_warehouse(self):
+        """Warehouse the products of this visit leave from: the branch's, else the first of its company.
 
-            return True
+        Only the visit is looked at, never the current user, so that the
+        delivery cron ships from the same place as an interactive user.
+        """
+        self.ensure_one()
+        if self.analytic_account_id.warehouse_id:
+            return self.analytic_account_id.warehouse_id
+        company = self._get_delivery_company()
+        return self.env['stock.warehouse'].sudo().search([('company_id', '=', company.id)], limit=1)
 
+    @metrics.instrument('deliver_products')
     def action_deliver_products(self):
-        StockPicking = self.env['stock.picking']
-        StockMove = self.env['stock.move']
-        try:
-            StockLotModel = self.env['stock.lot']
-        except KeyError:
-            StockLotModel = self.env['stock.production.lot']
+        self._deliver_products()
+        return True
+
+    def _deliver_products(self):
+        """Deliver the product lines of the visits, one picking per branch warehouse.
 
+        Moves, move lines and lots of a picking are each created in one call
+        and the picking is validated once for all of its visits.
+
+        :return: {visit id: picking} for the visits a picking was made for
+        """
+        dest_location = self.env.ref('stock.stock_location_customers', raise_if_not_found=False)
+        if not dest_location:
+            raise UserError(_("The 'Customers' stock location could not be found."))
+
+        lines_by_warehouse = defaultdict(lambda: self.env['vet.animal.visit.line'])
+        nothing_to_deliver = self.browse()
         for visit in self:
             if visit.delivered:
                 _logger.info("Visit %s already delivered, skipping", visit.name)
@@ -616,75 +890,100 @@ class VetAnimalVisit(models.Model):
             deliverable_lines = visit.line_ids.filtered(
                 lambda l: l.product_id and l.quantity > 0 and not l.delivered
             )
-
             if not deliverable_lines:
-                visit.delivered = True
+                nothing_to_deliver |= visit
                 continue
 
-            warehouse = self.env.user._get_default_warehouse_id()
+            warehouse = visit._get_delivery_warehouse()
             if not warehouse or not warehouse.out_type_id or not warehouse.lot_stock_id:
                 raise UserError(_("Please configure the default warehouse with an Outgoing Shipments type and a stock location."))
-            picking_type = warehouse.out_type_id
-            dest_location = self.env.ref('stock.stock_location_customers', raise_if_not_found=False)
-            if not dest_location:
-                raise UserError(_("The 'Customers' stock location could not be found."))
-
-            picking = StockPicking.create({
-                'picking_type_id': picking_type.id,
-                'location_id': warehouse.lot_stock_id.id,
-                'location_dest_id': dest_location.id,
-                'origin': f"Visit {visit.name}",
-                'partner_id': visit.owner_id and visit._get_or_create_partner_from_owner(visit.owner_id).id or False,
-            })
+            lines_by_warehouse[warehouse] |= deliverable_lines
 
-            for line in deliverable_lines:
-                move = StockMove.create({
-                    'name': line.product_id.display_name,
-                    'product_id': line.product_id.id,
-                    'product_uom_qty': line.quantity,
-                    'product_uom': line.product_id.uom_id.id,
-                    'picking_id': picking.id,
-                    'location_id': picking.location_id.id,
-                    'location_dest_id': picking.location_dest_id.id,
-                })
-                lot_id = False
-                if line.product_id.tracking in ('lot', 'serial'):
-                    lot_name = f"{visit.name}-{line.product_id.default_code or line.product_id.id}-{uuid.uuid4().hex[:8]}"
-                    lot = StockLotModel.create({
-                        'name': lot_name,
-                        'product_id': line.product_id.id,
-                        'company_id': self.env.company.id,
-                    })
-                    lot_id = lot.id
-                self.env['stock.move.line'].create({
-                    'move_id': move.id,
-                    'picking_id': picking.id,
-                    'product_id': line.product_id.id,
-                    'product_uom_id': line.product_id.uom_id.id,
-                    'quantity': line.quantity,
-                    'qty_done': line.quantity,
-                    'location_id': picking.location_id.id,
-                    'location_dest_id': picking.location_dest_id.id,
-                    'lot_id': lot_id,
-                })
+        if nothing_to_deliver:
+            nothing_to_deliver.with_context(skip_visit_validation=True).write({'delivered': True})
+        pickings = {}
+        for warehouse, lines in lines_by_warehouse.items():
+            picking = self._deliver_lines(warehouse, lines, dest_location)
+            pickings.update(dict.fromkeys(lines.visit_id.ids, picking))
+        return pickings
 
-            try:
-                picking.action_confirm()
-                picking.action_assign()
-                res = picking.button_validate()
-                if isinstance(res, dict):
-                    _logger.warning("Visit %s: Backorder created for picking %s.", visit.name, picking.name)
-                else:
-                    _logger.info("Visit %s: Stock picking %s validated successfully.", visit.name, picking.name)
+    @api.model
+    def _deliver_lines(self, warehouse, lines, dest_location):
+        """Deliver visit ``lines`` from ``warehouse`` in a single picking."""
+        self = self.with_company(warehouse.company_id)
+        try:
+            StockLotModel = self.env['stock.lot']
+        except KeyError:
+            StockLotModel = self.env['stock.production.lot']
+        visits = lines.visit_id
+        partners = {
+            visit: visit._get_or_create_partner_from_owner(visit.owner_id) if visit.owner_id else self.env['res.partner']
+            for visit in visits
+        }
+        distinct_partners = set(partners.values())
+        source_location = warehouse.lot_stock_id
+
+        picking = self.env['stock.picking'].create({
+            'picking_type_id': warehouse.out_type_id.id,
+            'location_id': source_location.id,
+            'location_dest_id': dest_location.id,
+            'origin': ", ".join(f"Visit {name}" for name in visits.mapped('name')),
+            'partner_id': distinct_partners.pop().id if len(distinct_partners) == 1 else False,
+        })
 
-                if picking.state == 'done':
-                    deliverable_lines.write({'delivered': True})
-                    visit.delivered = True
-            except Exception as e:
-                picking.unlink()
-                _logger.error("Visit %s: Failed to validate stock picking %s: %s", visit.name, picking.name, str(e))
-                raise UserError(_("Failed to process delivery for visit %s: %s") % (visit.name, str(e)))
+        tracked_lines = lines.filtered(lambda l: l.product_id.tracking in ('lot', 'serial'))
+        lots = StockLotModel.create([{
+            'name': f"{line.visit_id.name}-{line.product_id.default_code or line.product_id.id}-{uuid.uuid4().hex[:8]}",
+            'product_id': line.product_id.id,
+            'company_id': warehouse.company_id.id,
+        } for line in tracked_lines])
+        lot_by_line = dict(zip(tracked_lines, lots))
+
+        moves = self.env['stock.move'].create([{
+            'name': line.product_id.display_name,
+            'origin': line.visit_id.name,
+            'product_id': line.product_id.id,
+            'product_uom_qty': line.quantity,
+            'product_uom': line.product_id.uom_id.id,
+            'picking_id': picking.id,
+            'partner_id': partners[line.visit_id].id,
+            'location_id': source_location.id,
+            'location_dest_id': dest_location.id,
+        } for line in lines])
+        self.env['stock.move.line'].create([{
+            'move_id': move.id,
+            'picking_id': picking.id,
+            'product_id': line.product_id.id,
+            'product_uom_id': line.product_id.uom_id.id,
+            'quantity': line.quantity,
+            'picked': True,
+            'location_id': source_location.id,
+            'location_dest_id': dest_location.id,
+            'lot_id': lot_by_line[line].id if line in lot_by_line else False,
+        } for line, move in zip(lines, moves)])
 
+        try:
+            picking.action_confirm()
+            picking.action_assign()
+            res = picking.button_validate()
+            if isinstance(res, dict):
+                _logger.warning("Backorder created for picking %s (%s visit(s)).", picking.name, len(visits))
+            else:
+                _logger.info("Stock picking %s validated for %s visit(s), %s line(s).",
+                             picking.name, len(visits), len(lines))
+
+            if picking.state == 'done':
+                lines.write({'delivered': True})
+                visits.with_context(skip_visit_validation=True).write({'delivered': True})
+        except Exception as e:
+            picking.unlink()
+            _logger.error("Failed to validate stock picking %s for visits %s: %s",
+                          picking.name, ", ".join(visits.mapped('name')), str(e))
+            raise UserError(_("Failed to process delivery for visits %s: %s") % (", ".join(visits.mapped('name')), str(e)))
+        return picking
+
+    def action_retry_delivery(self):
+        self.delivery_job_ids.filtered(lambda j: j.state == 'failed').action_retry()
         return True
 
     def action_pay_invoice(self):
@@ -969,6 +1268,12 @@ class VetAnimalVisitPaymentWizard(models.Model):
         digits=(16, 2),
     )
 
+    @api.depends('visit_id')
+    def _compute_owner_unpaid_balance(self):
+        balances = self.env['vet.receivable.ledger']._get_balances(self.visit_id.owner_id.partner_id)
+        for wizard in self:
+            wizard.owner_unpaid_balance = balances.get(wizard.visit_id.owner_id.partner_id.id, (0.0, 0))[0]
+
     @api.model
     def default_get(self, fields_list):
         res = super(VetAnimalVisitPaymentWizard, self).default_get(fields_list)
@@ -999,6 +1304,7 @@ class VetAnimalVisitPaymentWizard(models.Model):
             self.owner_unpaid_balance = 0.0
             self.amount = 0.0
 
+    @metrics.instrument('confirm_payment')
     def action_confirm_payment(self):
         self.ensure_one()
         visit = self.env['vet.animal.visit'].browse(self.visit_id.id)
@@ -1044,94 +1350,32 @@ class VetAnimalVisitPaymentWizard(models.Model):
 
         _logger.info("Visit %s: Updated latest_payment_amount to %s", visit.name, amount)
 
+        allocations = self._allocate_fifo(invoices, amount)
+        before = invoices._vet_dashboard_snapshot()
         payments = self.env['account.payment']
-        remaining_amount = amount
-
         try:
-            for invoice in invoices:
-                if remaining_amount <= 0:
-                    break
-                payment_amount = min(remaining_amount, invoice.amount_residual)
-                if payment_amount <= 0:
-                    continue
-
-                PaymentRegister = self.env['account.payment.register']
-                ctx = {
-                    'active_model': 'account.move',
-                    'active_ids': [invoice.id],
-                    'default_amount': payment_amount,
-                    'default_partner_id': partner.id,
-                    'default_payment_type': 'inbound',
-                    'default_partner_type': 'customer',
-                    'default_journal_id': self.journal_id.id,
-                    'default_payment_reference': f"Payment for {visit.name} - Invoice {invoice.name}",
-                }
-                _logger.debug("Visit %s: Processing payment of %s for invoice %s", visit.name, payment_amount, invoice.name)
-                payment_wizard = PaymentRegister.with_context(ctx).create({})
-                payment_wizard.payment_difference_handling = 'reconcile' if payment_amount >= invoice.amount_residual else 'open'
-                payment_result = payment_wizard._create_payments()
-                new_payment = payment_result if isinstance(payment_result, self.env['account.payment']) else self.env['account.payment'].browse(payment_result.ids)
-                payments |= new_payment
-                remaining_amount -= payment_amount
-                _logger.info("Visit %s: Payment of %s registered for invoice %s", visit.name, payment_amount, invoice.name)
-
-            if remaining_amount > 0:
-                _logger.warning("Visit %s: Payment amount %s not fully allocated", visit.name, remaining_amount)
-
+            with self.env.cr.savepoint():
+                payments = self._create_single_payment(visit, partner, amount)
+                payment_lines = payments.move_id.line_ids
         except Exception as e:
             _logger.warning("Standard payment register failed for visit %s: %s", visit.name, str(e))
-            remaining_amount = self.amount
-            for invoice in invoices:
-                if remaining_amount <= 0:
-                    break
-                payment_amount = min(remaining_amount, invoice.amount_residual)
-                if payment_amount <= 0:
-                    continue
-
-                payment_move = self.env["account.move"].create({
-                    'move_type': 'entry',
-                    'date': fields.Date.context_today(self),
-                    'ref': f"Payment for {visit.name} - Invoice {invoice.name}",
-                    'journal_id': self.journal_id.id,
-                    'line_ids': [
-                        (0, 0, {
-                            'name': f"Payment for {visit.name} - Invoice {invoice.name}",
-                            'debit': 0.0,
-                            'credit': payment_amount,
-                            'account_id': partner.property_account_receivable_id.id,
-                            'partner_id': partner.id,
-                        }),
-                        (0, 0, {
-                            'name': f"Cash/Bank for {visit.name} - Invoice {invoice.name}",
-                            'debit': payment_amount,
-                            'credit': 0.0,
-                            'account_id': self.journal_id.default_account_id.id,
-                            'partner_id': partner.id,
-                        }),
-                    ],
-                })
-                payment_move.action_post()
-                _logger.info("Visit %s: Manual journal entry created for invoice %s: %s", visit.name, invoice.name, payment_move.name)
-
-                receivable_line = invoice.line_ids.filtered(
-                    lambda l: l.account_id == partner.property_account_receivable_id and not l.reconciled
-                )
-                payment_line = payment_move.line_ids.filtered(
-                    lambda l: l.account_id == partner.property_account_receivable_id
-                )
-                if receivable_line and payment_line:
-                    try:
-                        (receivable_line + payment_line).reconcile()
-                        _logger.info("Visit %s: Fallback reconciliation successful for invoice %s", visit.name, invoice.name)
-                    except Exception as e:
-                        _logger.error("Visit %s: Fallback reconciliation failed for invoice %s: %s", visit.name, invoice.name, e)
+            payments = self.env['account.payment']
+            payment_lines = self._create_payment_entry(visit, partner, amount).line_ids
 
-                remaining_amount -= payment_amount
+        receivable_account = partner.property_account_receivable_id
+        payment_lines = payment_lines.filtered(lambda l: l.account_id == receivable_account and not l.reconciled)
+        # A failure here must roll the payment back with it, not leave it unreconciled
+        self.env['account.move.line']._reconcile_plan([
+            self._fifo_reconciliation_plan(payment_lines, allocations, receivable_account)
+        ])
+        _logger.info("Visit %s: Payment of %s reconciled with %s invoice(s)", visit.name, amount, len(allocations))
 
         invoices._compute_payment_state()
         invoices.invalidate_recordset(['payment_state', 'amount_residual'])
         visit.invalidate_recordset(['payment_state', 'is_fully_paid', 'amount_received'])
         visit.with_context(skip_visit_validation=True)._sync_state_with_payment()
+        # The payment method written on the visit re-keys its invoices in the rollup
+        invoices._vet_refresh_reporting(before)
         _logger.info(
             "Visit %s: Post-payment - State=%s, payment_state=%s, is_fully_paid=%s, amount_received=%s, invoice_residual=%s",
             visit.name, visit.state, visit.payment_state, visit.is_fully_paid, visit.amount_received,
@@ -1140,18 +1384,92 @@ class VetAnimalVisitPaymentWizard(models.Model):
 
         return self._generate_receipt(visit, invoices, payments[0] if payments else None)
 
+    @api.model
+    def _allocate_fifo(self, invoices, amount):
+        """[(invoice, allocated amount)] paying ``invoices`` oldest first until ``amount`` runs out."""
+        allocations = []
+        remaining_amount = amount
+        for invoice in invoices:
+            if remaining_amount <= 0:
+                break
+            payment_amount = min(remaining_amount, invoice.amount_residual)
+            if payment_amount <= 0:
+                continue
+            allocations.append((invoice, payment_amount))
+            remaining_amount -= payment_amount
+        return allocations
+
+    def _create_single_payment(self, visit, partner, amount):
+        """One posted customer payment of ``amount``; reconciled by the caller."""
+        payment = self.env['account.payment'].create({
+            'payment_type': 'inbound',
+            'partner_type': 'customer',
+            'partner_id': partner.id,
+            'amount': amount,
+            'journal_id': self.journal_id.id,
+            'date': fields.Date.context_today(self),
+            'payment_reference': f"Payment for {visit.name}",
+            'visit_id': visit.id,
+        })
+        payment.action_post()
+        if not payment.move_id:
+            raise UserError(_("Journal %s posts no entry for payments.") % self.journal_id.name)
+        _logger.info("Visit %s: Payment %s of %s registered", visit.name, payment.name, amount)
+        return payment
+
+    def _create_payment_entry(self, visit, partner, amount):
+        """Fallback: one manual journal entry moving ``amount`` from the receivable to the journal account."""
+        payment_move = self.env["account.move"].create({
+            'move_type': 'entry',
+            'date': fields.Date.context_today(self),
+            'ref': f"Payment for {visit.name}",
+            'journal_id': self.journal_id.id,
+            'line_ids': [
+                (0, 0, {
+                    'name': f"Payment for {visit.name}",
+                    'debit': 0.0,
+                    'credit': amount,
+                    'account_id': partner.property_account_receivable_id.id,
+                    'partner_id': partner.id,
+                }),
+                (0, 0, {
+                    'name': f"Cash/Bank for {visit.name}",
+                    'debit': amount,
+                    'credit': 0.0,
+                    'account_id': self.journal_id.default_account_id.id,
+                    'partner_id': partner.id,
+                }),
+            ],
+        })
+        payment_move.action_post()
+        _logger.info("Visit %s: Manual journal entry created: %s", visit.name, payment_move.name)
+        return payment_move
+
+    @api.model
+    def _fifo_reconciliation_plan(self, payment_lines, allocations, receivable_account):
+        """Nested plan matching the payment with the invoices one after the other.
+
+        Each level reconciles what is left of the payment with the next
+        invoice only, so the amounts land exactly as ``allocations`` says
+        whatever the due dates, in a single _reconcile_plan call.
+        """
+        plan = payment_lines
+        for invoice, __ in allocations:
+            invoice_lines = invoice.line_ids.filtered(
+                lambda l: l.account_id == receivable_account and not l.reconciled
+            )
+            plan = [plan, invoice_lines]
+        return plan
+
     def _generate_receipt(self, visit, invoices, payment=None):
-        try:
-            payments = self.env['account.payment'].search([
-                ('payment_reference', 'ilike', visit.name),
-                ('state', '=', 'posted'),
-                ('date', '>=', fields.Date.context_today(self)),
-            ], order='create_date desc', limit=1)
-            if payments:
-                _logger.info("Visit %s: Generating payment receipt for payment %s", visit.name, payments.name)
-                return self.env.ref('account.account_payment_receipt_action').report_action(payments)
-        except Exception as e:
-            _logger.warning("Payment receipt not available for visit %s: %s", visit.name, e)
+        # Without the payment just made (e.g. a manual entry was used) the
+        # visit receipt is printed, never an older payment of the visit
+        if payment:
+            try:
+                _logger.info("Visit %s: Generating payment receipt for payment %s", visit.name, payment.name)
+                return self.env.ref('account.account_payment_receipt_action').report_action(payment)
+            except Exception as e:
+                _logger.warning("Payment receipt not available for visit %s: %s", visit.name, e)
         try:
             _logger.info("Visit %s: Falling back to visit receipt", visit.name)
             return self.env.ref('vet_test.action_report_visit_receipt').report_action(visit)
@@ -0,0 +1,16 @@
+from odoo import models
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        # Subscribe users to their branches so dashboard deltas published on a
+        # branch record only reach the people allowed to see that branch.
+        channels = super()._build_bus_channel_list(channels)
+        if self.env.uid and not self.env.user._is_public():
+            branches = self.env.user.analytic_account_ids
+            if not branches:
+                branches = self.env['account.analytic.account'].search([])
+            channels = list(channels) + list(branches)
+        return channels
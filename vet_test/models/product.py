@@ -0,0 +1,104 @@
+from odoo import api, models, tools
+
+# Fields whose change invalidates the cached invoicing accounts and taxes
+PRODUCT_ACCOUNTING_FIELDS = {'property_account_income_id', 'taxes_id', 'categ_id', 'company_id'}
+CATEGORY_ACCOUNTING_FIELDS = {'property_account_income_categ_id'}
+ACCOUNT_FIELDS = {'account_type', 'company_ids', 'code', 'deprecated', 'active'}
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def init(self):
+        super().init()
+        # The resolvers below are cached under the current generation. Bumping
+        # it from a unique sequence value retires their entries in every
+        # process without clearing the rest of the registry cache, and a
+        # rolled back bump can never be handed out again.
+        self._cr.execute("""
+            CREATE SEQUENCE IF NOT EXISTS vet_invoice_accounting_seq;
+            CREATE TABLE IF NOT EXISTS vet_invoice_accounting_generation (
+                id integer PRIMARY KEY CHECK (id = 1),
+                generation bigint NOT NULL
+            );
+            INSERT INTO vet_invoice_accounting_generation (id, generation)
+            VALUES (1, nextval('vet_invoice_accounting_seq'))
+            ON CONFLICT (id) DO NOTHING;
+        """)
+
+    @api.model
+    def _vet_accounting_generation(self):
+        self._cr.execute("SELECT generation FROM vet_invoice_accounting_generation")
+        return self._cr.fetchone()[0]
+
+    @api.model
+    def _vet_invalidate_accounting(self):
+        """Retire the cached invoicing accounts and taxes of every process."""
+        self._cr.execute("UPDATE vet_invoice_accounting_generation SET generation = nextval('vet_invoice_accounting_seq')")
+
+    @api.model
+    @tools.ormcache('self.env.company.id', 'self._vet_accounting_generation()')
+    def _vet_default_income_account_id(self):
+        """First income account of the current company, used when a line has none."""
+        company = self.env.company
+        Account = self.env['account.account'].sudo().with_company(company)
+        return Account.search([
+            *Account._check_company_domain(company),
+            ('account_type', '=', 'income'),
+        ], limit=1).id
+
+    @api.model
+    @tools.ormcache('self.env.company.id', 'product_id', 'self._vet_accounting_generation()')
+    def _vet_invoice_accounting(self, product_id):
+        """(income account id, tax ids) invoiced for the product in the current company.
+
+        The account falls back from the product to its category; the cache is
+        retired when either one's accounting fields change.
+        """
+        company = self.env.company
+        product = self.sudo().with_company(company).browse(product_id)
+        tmpl = product.product_tmpl_id
+        account = tmpl.property_account_income_id or tmpl.categ_id.property_account_income_categ_id
+        taxes = product.taxes_id._filter_taxes_by_company(company)
+        return account.id, tuple(taxes.ids)
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if PRODUCT_ACCOUNTING_FIELDS & set(vals):
+            self.env['product.product']._vet_invalidate_accounting()
+        return res
+
+
+class ProductCategory(models.Model):
+    _inherit = 'product.category'
+
+    def write(self, vals):
+        res = super().write(vals)
+        if CATEGORY_ACCOUNTING_FIELDS & set(vals):
+            self.env['product.product']._vet_invalidate_accounting()
+        return res
+
+
+class AccountAccount(models.Model):
+    _inherit = 'account.account'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        accounts = super().create(vals_list)
+        self.env['product.product']._vet_invalidate_accounting()
+        return accounts
+
+    def write(self, vals):
+        res = super().write(vals)
+        if ACCOUNT_FIELDS & set(vals):
+            self.env['product.product']._vet_invalidate_accounting()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['product.product']._vet_invalidate_accounting()
+        return res
@@ -1,4 +1,5 @@
 from odoo import api, fields, models
+from odoo.tools import create_index
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -9,8 +10,8 @@ class VetAnimalVisitLine(models.Model):
 
     service_id = fields.Many2one('vet.service', string='Service')
     product_id = fields.Many2one('product.product', related='service_id.product_id', store=True, readonly=True)
-    service_type = fields.Selection(related='service_id.service_type', store=True, readonly=True)
-    visit_id = fields.Many2one('vet.animal.visit', string="Visit")
+    service_type = fields.Selection(related='service_id.service_type', store=True, readonly=True, index=True)
+    visit_id = fields.Many2one('vet.animal.visit', string="Visit", index=True)
     quantity = fields.Float('Quantity', default=1.0)
     price_unit = fields.Float('Unit Price', compute='_compute_price_unit', store=True)
     subtotal = fields.Float('Subtotal', compute='_compute_subtotal', store=True)
@@ -23,6 +24,11 @@ class VetAnimalVisitLine(models.Model):
     delivered = fields.Boolean(default=False, string="Delivered")
     discount = fields.Float("Discount (%)", default=0.0)
 
+    def init(self):
+        super().init()
+        # Incremental analytics export: keyset scan on (write_date, id)
+        create_index(self._cr, 'vet_animal_visit_line_write_date_id_index', self._table, ['write_date', 'id'])
+
     @api.depends('service_id')
     def _compute_price_unit(self):
         for line in self:
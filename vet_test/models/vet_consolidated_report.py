@@ -0,0 +1,140 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+import logging
+import threading
+
+from ..tools import replica
+
+_logger = logging.getLogger(__name__)
+
+# Branches aggregated at once, each on its own database connection
+CONSOLIDATED_MAX_WORKERS = 4
+
+
+def _branch_figures(cr, branch_id, date_from, date_to):
+    """All the figures of one branch over [date_from, date_to]."""
+    start = datetime.combine(date_from, time.min)
+    end = datetime.combine(date_to + timedelta(days=1), time.min)
+    cr.execute("""
+        SELECT COUNT(*),
+               COUNT(DISTINCT doctor_id),
+               COALESCE(SUM(CASE WHEN discount_percent > 0
+                                 THEN (subtotal + COALESCE(treatment_charge, 0)) * discount_percent / 100
+                                 WHEN discount_fixed > 0 THEN discount_fixed
+                                 ELSE 0 END), 0)
+        FROM vet_animal_visit
+        WHERE analytic_account_id = %s AND date >= %s AND date < %s AND state != 'cancel'
+    """, (branch_id, start, end))
+    visit_count, active_doctor_count, discount = cr.fetchone()
+    cr.execute("""
+        SELECT COALESCE(SUM(amount_total), 0), COALESCE(SUM(amount_paid), 0)
+        FROM vet_revenue_daily
+        WHERE analytic_account_id = %s AND date BETWEEN %s AND %s
+    """, (branch_id, date_from, date_to))
+    revenue, collected = cr.fetchone()
+    cr.execute("""
+        SELECT COALESCE(SUM(amount_residual_signed), 0)
+        FROM account_move
+        WHERE analytic_account_id = %s AND move_type = 'out_invoice' AND state = 'posted'
+          AND payment_state IN ('not_paid', 'partial')
+    """, (branch_id,))
+    unpaid_amount = cr.fetchone()[0]
+    cr.execute("""
+        SELECT COUNT(*) FROM vet_animal_doctor WHERE analytic_account_id = %s AND active
+    """, (branch_id,))
+    doctor_count = cr.fetchone()[0]
+    return {
+        'analytic_account_id': branch_id,
+        'visit_count': visit_count,
+        'revenue': revenue,
+        'collected': collected,
+        'discount': discount,
+        'unpaid_amount': unpaid_amount,
+        'doctor_count': doctor_count,
+        'active_doctor_count': active_doctor_count,
+        'utilisation': 100.0 * active_doctor_count / doctor_count if doctor_count else 0.0,
+        'visits_per_doctor': visit_count / active_doctor_count if active_doctor_count else 0.0,
+    }
+
+
+class VetConsolidatedReport(models.TransientModel):
+    _name = "vet.consolidated.report"
+    _description = "Vet Consolidated Branch Report"
+
+    date_from = fields.Date(string="From", required=True, default=lambda self: fields.Date.context_today(self).replace(day=1))
+    date_to = fields.Date(string="To", required=True, default=fields.Date.context_today)
+    branch_ids = fields.Many2many(
+        'account.analytic.account',
+        string="Branches",
+        help="Leave empty to report on every branch you are assigned to."
+    )
+    line_ids = fields.One2many("vet.consolidated.report.line", "report_id", string="Branches")
+    currency_id = fields.Many2one('res.currency', default=lambda self: self.env.company.currency_id)
+
+    @api.model
+    def _compute_figures(self, branch_ids, date_from, date_to):
+        """Figures of every branch, each branch aggregated in parallel on its own cursor.
+
+        The report only reads committed data: worker cursors do not see what
+        the current transaction has not committed yet. They are opened on the
+        reporting replica when one is configured and current.
+        """
+        dbname = self._cr.dbname
+        registry = self.env.registry
+
+        def job(branch_id):
+            threading.current_thread().dbname = dbname
+            with replica.replica_cursor(dbname) or registry.cursor() as cr:
+                return _branch_figures(cr, branch_id, date_from, date_to)
+
+        self.env.flush_all()
+        workers = max(1, min(CONSOLIDATED_MAX_WORKERS, len(branch_ids)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vet_consolidated') as executor:
+            return list(executor.map(job, branch_ids))
+
+    def _get_report_branches(self):
+        """The selected branches, or all the user's; users without branches may report on any."""
+        user_branches = self.env.user.analytic_account_ids
+        if not user_branches:
+            return self.branch_ids or self.env['account.analytic.account'].search([])
+        forbidden = self.branch_ids - user_branches
+        if forbidden:
+            raise UserError(_("You are not assigned to the branch(es) %s.") % ", ".join(forbidden.mapped('display_name')))
+        return self.branch_ids or user_branches
+
+    def action_compute(self):
+        self.ensure_one()
+        branches = self._get_report_branches()
+        figures = self._compute_figures(branches.ids, self.date_from, self.date_to)
+        self.line_ids = [(5, 0, 0)] + [(0, 0, values) for values in figures]
+        _logger.info("Consolidated report %s: %s branch(es) from %s to %s",
+                     self.id, len(figures), self.date_from, self.date_to)
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Consolidated Report"),
+            'res_model': 'vet.consolidated.report',
+            'view_mode': 'form',
+            'res_id': self.id,
+            'target': 'current',
+        }
+
+
+class VetConsolidatedReportLine(models.TransientModel):
+    _name = "vet.consolidated.report.line"
+    _description = "Vet Consolidated Branch Report Line"
+    _order = "revenue desc"
+
+    report_id = fields.Many2one("vet.consolidated.report", string="Report", ondelete="cascade")
+    currency_id = fields.Many2one(related='report_id.currency_id')
+    analytic_account_id = fields.Many2one('account.analytic.account', string="Branch")
+    visit_count = fields.Integer(string="Visits")
+    revenue = fields.Monetary(string="Revenue", currency_field='currency_id')
+    collected = fields.Monetary(string="Collected", currency_field='currency_id')
+    discount = fields.Monetary(string="Discounts", currency_field='currency_id')
+    unpaid_amount = fields.Monetary(string="Unpaid Balance", currency_field='currency_id')
+    doctor_count = fields.Integer(string="Doctors")
+    active_doctor_count = fields.Integer(string="Doctors with Visits")
+    utilisation = fields.Float(string="Doctor Utilisation (%)", digits=(16, 1))
+    visits_per_doctor = fields.Float(string="Visits per Doctor", digits=(16, 1))
@@ -1,4 +1,70 @@
-from odoo import fields, models, tools
+from odoo import api, fields, models
+from collections import defaultdict
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Counter key -> query used by the repair command to recount from scratch,
+# as (branch id, value) rows; branch 0 holds the rows without a branch and
+# the clinic-wide counters.
+DASHBOARD_COUNTERS = {
+    'animals': "SELECT 0, COUNT(*) FROM vet_animal",
+    'owners': "SELECT 0, COUNT(*) FROM vet_animal_owner",
+    'branch_animals': """
+        SELECT COALESCE(analytic_account_id, 0), COUNT(DISTINCT animal_id)
+        FROM vet_animal_visit WHERE animal_id IS NOT NULL GROUP BY 1
+    """,
+    'branch_owners': """
+        SELECT COALESCE(analytic_account_id, 0), COUNT(DISTINCT owner_id)
+        FROM vet_animal_visit WHERE owner_id IS NOT NULL GROUP BY 1
+    """,
+    'branch_doctors': """
+        SELECT COALESCE(analytic_account_id, 0), COUNT(*)
+        FROM vet_animal_doctor WHERE active GROUP BY 1
+    """,
+    'open_visits': """
+        SELECT COALESCE(analytic_account_id, 0), COUNT(*)
+        FROM vet_animal_visit WHERE state IN ('draft', 'confirmed') GROUP BY 1
+    """,
+    'invoices_pending': """
+        SELECT COALESCE(analytic_account_id, 0), COUNT(*)
+        FROM account_move
+        WHERE move_type = 'out_invoice' AND state = 'posted' AND payment_state != 'paid' GROUP BY 1
+    """,
+    'invoices_paid': """
+        SELECT COALESCE(analytic_account_id, 0), COUNT(*)
+        FROM account_move
+        WHERE move_type = 'out_invoice' AND state = 'posted' AND payment_state = 'paid' GROUP BY 1
+    """,
+}
+
+# Counter key -> branch tile it feeds
+BRANCH_TILES = {
+    'branch_animals': 'animals',
+    'branch_owners': 'owners',
+    'branch_doctors': 'doctors',
+    'open_visits': 'open_visits',
+    'invoices_pending': 'pending_invoices',
+    'invoices_paid': 'paid_invoices',
+}
+# Counter key -> clinic total it is summed into, over every branch
+CLINIC_TILES = {
+    'animals': 'animals',
+    'owners': 'owners',
+    'branch_doctors': 'doctors',
+    'invoices_pending': 'pending_invoices',
+    'invoices_paid': 'paid_invoices',
+}
+
+# Bus notification type carrying {'branch_id': id, 'tiles': {tile: delta}}
+BUS_DASHBOARD_DELTA = 'vet_test.dashboard/delta'
+
+# Table -> counter key for the tables whose row count is tracked as a whole.
+COUNTED_TABLES = {
+    'vet_animal': 'animals',
+    'vet_animal_owner': 'owners',
+}
+
 
 class VetDashboard(models.Model):
     _name = "vet.dashboard"
@@ -21,13 +87,26 @@ class VetDashboard(models.Model):
     def init(self):
         cr = self._cr
         table = self._table
+        self._init_counters()
         cr.execute(f"DROP VIEW IF EXISTS {table} CASCADE")
+        # Counters are stored in vet_dashboard_counter and kept current by the
+        # triggers installed in _init_counters(); pending increments live in
+        # vet_dashboard_counter_delta until the compaction cron folds them in.
         cr.execute(f"""
             CREATE OR REPLACE VIEW {table} AS (
+                WITH counter AS (
+                    SELECT key, SUM(value) AS value
+                    FROM (
+                        SELECT key, value FROM vet_dashboard_counter
+                        UNION ALL
+                        SELECT key, delta FROM vet_dashboard_counter_delta
+                    ) c
+                    GROUP BY key
+                )
                 SELECT
                     1 AS id,
                     'Animals' AS name,
-                    (SELECT COUNT(*) FROM vet_animal) AS value,
+                    COALESCE((SELECT value FROM counter WHERE key='animals'), 0)::integer AS value,
                     'primary' AS color,
                     'fa fa-paw' AS icon,
                     '/odoo/action-948' AS url,
@@ -37,7 +116,7 @@ class VetDashboard(models.Model):
                 SELECT
                     2 AS id,
                     'Owners' AS name,
-                    (SELECT COUNT(*) FROM vet_animal_owner) AS value,
+                    COALESCE((SELECT value FROM counter WHERE key='owners'), 0)::integer AS value,
                     'success' AS color,
                     'fa fa-user' AS icon,
                     '/odoo/action-824' AS url,
@@ -47,7 +126,7 @@ class VetDashboard(models.Model):
                 SELECT
                     3 AS id,
                     'Doctors' AS name,
-                    (SELECT COUNT(*) FROM vet_animal_doctor) AS value,
+                    COALESCE((SELECT value FROM counter WHERE key='branch_doctors'), 0)::integer AS value,
                     'warning' AS color,
                     'fa fa-user-md' AS icon,
                     '/odoo/action-823' AS url,
@@ -61,12 +140,419 @@ class VetDashboard(models.Model):
                     'graph' AS color,
                     'fa fa-money fa-2x text-success' AS icon,
                     '/web#action=vet_new.action_invoices_graph' AS url,
-                    (SELECT COUNT(*) FROM account_move WHERE move_type='out_invoice' AND payment_state!='paid') AS pending_count,
-                    (SELECT COUNT(*) FROM account_move WHERE move_type='out_invoice' AND payment_state='paid') AS paid_count
+                    COALESCE((SELECT value FROM counter WHERE key='invoices_pending'), 0)::integer AS pending_count,
+                    COALESCE((SELECT value FROM counter WHERE key='invoices_paid'), 0)::integer AS paid_count
+            )
+        """)
+
+    def _init_counters(self):
+        """Create the counter tables and the triggers maintaining them.
+
+        Counters are kept per branch. Triggers only ever INSERT into the
+        delta table so that concurrent transactions never contend on the
+        same counter row; the distinct animals and owners of a branch are
+        reference counted in vet_dashboard_branch_member, one row per
+        (branch, animal or owner).
+        """
+        cr = self._cr
+        cr.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'vet_dashboard_counter_delta' AND column_name = 'branch_id'
+        """)
+        if not cr.fetchone():
+            # Counters from before the branch key: recounted below
+            cr.execute("DROP TABLE IF EXISTS vet_dashboard_counter, vet_dashboard_counter_delta CASCADE")
+        cr.execute("""
+            CREATE TABLE IF NOT EXISTS vet_dashboard_counter (
+                key varchar NOT NULL,
+                branch_id integer NOT NULL DEFAULT 0,
+                value bigint NOT NULL DEFAULT 0,
+                PRIMARY KEY (key, branch_id)
+            );
+            CREATE TABLE IF NOT EXISTS vet_dashboard_counter_delta (
+                id bigserial PRIMARY KEY,
+                key varchar NOT NULL,
+                branch_id integer NOT NULL DEFAULT 0,
+                delta bigint NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS vet_dashboard_branch_member (
+                kind varchar NOT NULL,
+                branch_id integer NOT NULL,
+                member_id integer NOT NULL,
+                refs integer NOT NULL,
+                PRIMARY KEY (kind, branch_id, member_id)
+            );
+
+            CREATE OR REPLACE FUNCTION vet_dashboard_count_rows() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO vet_dashboard_counter_delta (key, delta)
+                    SELECT TG_ARGV[0], COUNT(*) FROM new_rows HAVING COUNT(*) > 0;
+                ELSE
+                    INSERT INTO vet_dashboard_counter_delta (key, delta)
+                    SELECT TG_ARGV[0], -COUNT(*) FROM old_rows HAVING COUNT(*) > 0;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION vet_dashboard_count_invoices() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta)
+                    SELECT CASE WHEN payment_state = 'paid' THEN 'invoices_paid' ELSE 'invoices_pending' END,
+                           COALESCE(analytic_account_id, 0), COUNT(*)
+                    FROM new_rows
+                    WHERE move_type = 'out_invoice' AND state = 'posted' AND payment_state IS NOT NULL
+                    GROUP BY 1, 2;
+                ELSIF TG_OP = 'DELETE' THEN
+                    INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta)
+                    SELECT CASE WHEN payment_state = 'paid' THEN 'invoices_paid' ELSE 'invoices_pending' END,
+                           COALESCE(analytic_account_id, 0), -COUNT(*)
+                    FROM old_rows
+                    WHERE move_type = 'out_invoice' AND state = 'posted' AND payment_state IS NOT NULL
+                    GROUP BY 1, 2;
+                ELSE
+                    IF OLD.move_type = 'out_invoice' AND OLD.state = 'posted' AND OLD.payment_state IS NOT NULL THEN
+                        INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta)
+                        VALUES (CASE WHEN OLD.payment_state = 'paid' THEN 'invoices_paid' ELSE 'invoices_pending' END,
+                                COALESCE(OLD.analytic_account_id, 0), -1);
+                    END IF;
+                    IF NEW.move_type = 'out_invoice' AND NEW.state = 'posted' AND NEW.payment_state IS NOT NULL THEN
+                        INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta)
+                        VALUES (CASE WHEN NEW.payment_state = 'paid' THEN 'invoices_paid' ELSE 'invoices_pending' END,
+                                COALESCE(NEW.analytic_account_id, 0), 1);
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION vet_dashboard_count_doctors() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    IF OLD.active THEN
+                        INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta)
+                        VALUES ('branch_doctors', COALESCE(OLD.analytic_account_id, 0), -1);
+                    END IF;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    IF NEW.active THEN
+                        INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta)
+                        VALUES ('branch_doctors', COALESCE(NEW.analytic_account_id, 0), 1);
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+
+            -- Adds ``sign`` to the references of a branch member; its branch
+            -- counter moves only when the first one appears or the last one goes
+            CREATE OR REPLACE FUNCTION vet_dashboard_count_member(
+                member_kind varchar, branch integer, member integer, sign integer
+            ) RETURNS void AS $$
+            DECLARE
+                remaining integer;
+            BEGIN
+                INSERT INTO vet_dashboard_branch_member (kind, branch_id, member_id, refs)
+                VALUES (member_kind, branch, member, sign)
+                ON CONFLICT (kind, branch_id, member_id)
+                DO UPDATE SET refs = vet_dashboard_branch_member.refs + EXCLUDED.refs
+                RETURNING refs INTO remaining;
+                IF sign > 0 AND remaining = 1 THEN
+                    INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta) VALUES (member_kind, branch, 1);
+                ELSIF sign < 0 AND remaining = 0 THEN
+                    INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta) VALUES (member_kind, branch, -1);
+                    DELETE FROM vet_dashboard_branch_member
+                    WHERE kind = member_kind AND branch_id = branch AND member_id = member AND refs = 0;
+                END IF;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION vet_dashboard_count_visit(
+                branch integer, animal integer, owner integer, visit_state varchar, sign integer
+            ) RETURNS void AS $$
+            BEGIN
+                IF visit_state IN ('draft', 'confirmed') THEN
+                    INSERT INTO vet_dashboard_counter_delta (key, branch_id, delta) VALUES ('open_visits', branch, sign);
+                END IF;
+                IF animal IS NOT NULL THEN
+                    PERFORM vet_dashboard_count_member('branch_animals', branch, animal, sign);
+                END IF;
+                IF owner IS NOT NULL THEN
+                    PERFORM vet_dashboard_count_member('branch_owners', branch, owner, sign);
+                END IF;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE OR REPLACE FUNCTION vet_dashboard_count_visits() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM vet_dashboard_count_visit(COALESCE(OLD.analytic_account_id, 0), OLD.animal_id,
+                                                      OLD.owner_id, OLD.state, -1);
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM vet_dashboard_count_visit(COALESCE(NEW.analytic_account_id, 0), NEW.animal_id,
+                                                      NEW.owner_id, NEW.state, 1);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+        """)
+
+        for table, key in COUNTED_TABLES.items():
+            cr.execute(f"""
+                DROP TRIGGER IF EXISTS vet_dashboard_count_insert ON {table};
+                DROP TRIGGER IF EXISTS vet_dashboard_count_delete ON {table};
+                CREATE TRIGGER vet_dashboard_count_insert
+                    AFTER INSERT ON {table}
+                    REFERENCING NEW TABLE AS new_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION vet_dashboard_count_rows('{key}');
+                CREATE TRIGGER vet_dashboard_count_delete
+                    AFTER DELETE ON {table}
+                    REFERENCING OLD TABLE AS old_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION vet_dashboard_count_rows('{key}');
+            """)
+
+        # Updates are tracked per row: transition tables cannot be combined
+        # with a column list, and the WHEN clauses keep unrelated writes from
+        # ever calling the functions.
+        cr.execute("""
+            DROP TRIGGER IF EXISTS vet_dashboard_count_insert ON account_move;
+            DROP TRIGGER IF EXISTS vet_dashboard_count_delete ON account_move;
+            DROP TRIGGER IF EXISTS vet_dashboard_count_update ON account_move;
+            CREATE TRIGGER vet_dashboard_count_insert
+                AFTER INSERT ON account_move
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION vet_dashboard_count_invoices();
+            CREATE TRIGGER vet_dashboard_count_delete
+                AFTER DELETE ON account_move
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION vet_dashboard_count_invoices();
+            CREATE TRIGGER vet_dashboard_count_update
+                AFTER UPDATE OF move_type, state, payment_state, analytic_account_id ON account_move
+                FOR EACH ROW
+                WHEN (OLD.move_type IS DISTINCT FROM NEW.move_type
+                      OR OLD.state IS DISTINCT FROM NEW.state
+                      OR OLD.payment_state IS DISTINCT FROM NEW.payment_state
+                      OR OLD.analytic_account_id IS DISTINCT FROM NEW.analytic_account_id)
+                EXECUTE FUNCTION vet_dashboard_count_invoices();
+
+            -- The doctor table was counted as a whole before the branch key
+            DROP TRIGGER IF EXISTS vet_dashboard_count_insert ON vet_animal_doctor;
+            DROP TRIGGER IF EXISTS vet_dashboard_count_delete ON vet_animal_doctor;
+            DROP TRIGGER IF EXISTS vet_dashboard_count_doctor ON vet_animal_doctor;
+            DROP TRIGGER IF EXISTS vet_dashboard_count_doctor_update ON vet_animal_doctor;
+            CREATE TRIGGER vet_dashboard_count_doctor
+                AFTER INSERT OR DELETE ON vet_animal_doctor
+                FOR EACH ROW EXECUTE FUNCTION vet_dashboard_count_doctors();
+            CREATE TRIGGER vet_dashboard_count_doctor_update
+                AFTER UPDATE OF active, analytic_account_id ON vet_animal_doctor
+                FOR EACH ROW
+                WHEN (OLD.active IS DISTINCT FROM NEW.active
+                      OR OLD.analytic_account_id IS DISTINCT FROM NEW.analytic_account_id)
+                EXECUTE FUNCTION vet_dashboard_count_doctors();
+
+            DROP TRIGGER IF EXISTS vet_dashboard_count_visit ON vet_animal_visit;
+            DROP TRIGGER IF EXISTS vet_dashboard_count_visit_update ON vet_animal_visit;
+            CREATE TRIGGER vet_dashboard_count_visit
+                AFTER INSERT OR DELETE ON vet_animal_visit
+                FOR EACH ROW EXECUTE FUNCTION vet_dashboard_count_visits();
+            CREATE TRIGGER vet_dashboard_count_visit_update
+                AFTER UPDATE OF state, analytic_account_id, animal_id, owner_id ON vet_animal_visit
+                FOR EACH ROW
+                WHEN (OLD.state IS DISTINCT FROM NEW.state
+                      OR OLD.analytic_account_id IS DISTINCT FROM NEW.analytic_account_id
+                      OR OLD.animal_id IS DISTINCT FROM NEW.animal_id
+                      OR OLD.owner_id IS DISTINCT FROM NEW.owner_id)
+                EXECUTE FUNCTION vet_dashboard_count_visits();
+        """)
+
+        cr.execute("SELECT 1 FROM vet_dashboard_counter LIMIT 1")
+        if not cr.fetchone():
+            self._rebuild_counters()
+
+    @api.model
+    def _rebuild_counters(self):
+        """Recount every dashboard counter and branch member from the source tables.
+
+        Only the deltas visible to this transaction are discarded, so
+        increments committed concurrently are kept on top of the new totals.
+        """
+        for model in ('vet.animal.visit', 'vet.animal.doctor', 'account.move'):
+            self.env[model].flush_model()
+        cr = self._cr
+        cr.execute("DELETE FROM vet_dashboard_counter_delta")
+        cr.execute("UPDATE vet_dashboard_counter SET value = 0")
+        for key, query in DASHBOARD_COUNTERS.items():
+            cr.execute(f"""
+                INSERT INTO vet_dashboard_counter (key, branch_id, value)
+                SELECT %s, counts.* FROM ({query}) AS counts
+                ON CONFLICT (key, branch_id) DO UPDATE SET value = EXCLUDED.value
+            """, (key,))
+        cr.execute("""
+            DELETE FROM vet_dashboard_branch_member;
+            INSERT INTO vet_dashboard_branch_member (kind, branch_id, member_id, refs)
+            SELECT 'branch_animals', COALESCE(analytic_account_id, 0), animal_id, COUNT(*)
+            FROM vet_animal_visit WHERE animal_id IS NOT NULL GROUP BY 2, 3
+            UNION ALL
+            SELECT 'branch_owners', COALESCE(analytic_account_id, 0), owner_id, COUNT(*)
+            FROM vet_animal_visit WHERE owner_id IS NOT NULL GROUP BY 2, 3;
+        """)
+        _logger.info("Vet dashboard counters rebuilt")
+        return True
+
+    @api.model
+    def _compact_counters(self):
+        """Fold the pending deltas into the counter table (run by cron)."""
+        self._cr.execute("""
+            WITH moved AS (
+                DELETE FROM vet_dashboard_counter_delta RETURNING key, branch_id, delta
             )
+            INSERT INTO vet_dashboard_counter (key, branch_id, value)
+            SELECT key, branch_id, SUM(delta) FROM moved GROUP BY key, branch_id
+            ON CONFLICT (key, branch_id) DO UPDATE SET value = vet_dashboard_counter.value + EXCLUDED.value
         """)
+        return True
 
+    @api.model
+    def _read_counters(self, branch_ids=None):
+        """{(key, branch id): value} of the counters, pending deltas included."""
+        where = "WHERE branch_id IN %s" if branch_ids else ""
+        self._cr.execute(f"""
+            SELECT key, branch_id, SUM(value) FROM (
+                SELECT key, branch_id, value FROM vet_dashboard_counter
+                UNION ALL
+                SELECT key, branch_id, delta FROM vet_dashboard_counter_delta
+            ) c
+            {where}
+            GROUP BY key, branch_id
+        """, (tuple(branch_ids),) if branch_ids else None)
+        return {(key, branch_id): value for key, branch_id, value in self._cr.fetchall()}
 
+    @api.model
+    def _check_counters(self):
+        """Return {(key, branch id): (stored, actual)} for every counter that drifted."""
+        for model in ('vet.animal.visit', 'vet.animal.doctor', 'account.move'):
+            self.env[model].flush_model()
+        cr = self._cr
+        stored = self._read_counters()
+        drift = {}
+        for key, query in DASHBOARD_COUNTERS.items():
+            cr.execute(query)
+            actual = dict(cr.fetchall())
+            branch_ids = set(actual) | {branch_id for stored_key, branch_id in stored if stored_key == key}
+            for branch_id in branch_ids:
+                value = stored.get((key, branch_id), 0)
+                if value != actual.get(branch_id, 0):
+                    drift[key, branch_id] = (value, actual.get(branch_id, 0))
+        return drift
 
+    @api.model
+    def _cron_check_counters(self):
+        """Recount the counters when they drifted, e.g. after rows were changed with the triggers disabled."""
+        drift = self._check_counters()
+        if drift:
+            _logger.warning("Vet dashboard counters drifted, rebuilding: %s", drift)
+            self._rebuild_counters()
+        return len(drift)
 
+    # ===================== PER-BRANCH SUMMARY =====================
+    @api.model
+    def _get_branch_summary(self):
+        """All dashboard tiles for the user's branches, read from the counter table.
 
+        The counts come from the trigger maintained counters, so the cost
+        does not grow with the visits and invoices; today's revenue is one
+        indexed lookup in the daily rollup. Users without assigned branches
+        (administrators) get every branch, plus the clinic-wide totals.
+        """
+        branches = self.env.user.analytic_account_ids
+        clinic = not branches
+        if clinic:
+            branches = self.env['account.analytic.account'].search([])
+        branch_ids = tuple(branches.ids) or (0,)
+        today = fields.Date.context_today(self)
+        tiles = {
+            branch_id: {
+                'animals': 0, 'owners': 0, 'doctors': 0, 'open_visits': 0,
+                'pending_invoices': 0, 'paid_invoices': 0,
+                'revenue_today': 0.0, 'collected_today': 0.0,
+            }
+            for branch_id in branches.ids
+        }
+
+        totals = defaultdict(int)
+        counters = self._read_counters(None if clinic else branch_ids)
+        for (key, branch_id), value in counters.items():
+            if branch_id in tiles and key in BRANCH_TILES:
+                tiles[branch_id][BRANCH_TILES[key]] = int(value)
+            if clinic and key in CLINIC_TILES:
+                totals[CLINIC_TILES[key]] += int(value)
+
+        self.env['vet.revenue.daily'].flush_model()
+        cr = self._cr
+        cr.execute("""
+            SELECT analytic_account_id, SUM(amount_total), SUM(amount_paid)
+            FROM vet_revenue_daily
+            WHERE date = %s AND analytic_account_id IN %s
+            GROUP BY analytic_account_id
+        """, (today, branch_ids))
+        for branch_id, revenue, collected in cr.fetchall():
+            tiles[branch_id].update(revenue_today=revenue or 0.0, collected_today=collected or 0.0)
+
+        return {
+            'date': fields.Date.to_string(today),
+            'currency_id': self.env.company.currency_id.id,
+            'totals': dict(totals),
+            'branches': [
+                {'id': branch.id, 'name': branch.display_name, 'tiles': tiles[branch.id]}
+                for branch in branches
+            ],
+        }
+
+    @api.model
+    def _publish_deltas(self, deltas):
+        """Push ``{branch_id: {tile: delta}}`` to each branch's bus channel.
+
+        Branchless changes and zero deltas are dropped; the messages are only
+        delivered once the current transaction commits.
+        """
+        notifications = []
+        for branch in self.env['account.analytic.account'].browse([bid for bid in deltas if bid]).exists():
+            tiles = {tile: value for tile, value in deltas[branch.id].items() if value}
+            if tiles:
+                notifications.append((branch, BUS_DASHBOARD_DELTA, {'branch_id': branch.id, 'tiles': tiles}))
+        if notifications:
+            self.env['bus.bus'].sudo()._sendmany(notifications)
+
+    @api.model
+    def _get_metrics_gauges(self):
+        """Open visits and unpaid invoices per branch for ``/vet_test/metrics``."""
+        self.env['vet.animal.visit'].flush_model(['state', 'analytic_account_id'])
+        self.env['account.move'].flush_model(['move_type', 'state', 'payment_state', 'analytic_account_id'])
+        cr = self._cr
+        cr.execute("""
+            SELECT COALESCE(b.name->>'en_US', ''), COUNT(*)
+            FROM vet_animal_visit v
+            LEFT JOIN account_analytic_account b ON b.id = v.analytic_account_id
+            WHERE v.state IN ('draft', 'confirmed')
+            GROUP BY 1
+        """)
+        open_visits = [({'branch': branch}, count) for branch, count in cr.fetchall()]
+        cr.execute("""
+            SELECT COALESCE(b.name->>'en_US', ''), COUNT(*), COALESCE(SUM(m.amount_residual_signed), 0)
+            FROM account_move m
+            LEFT JOIN account_analytic_account b ON b.id = m.analytic_account_id
+            WHERE m.move_type = 'out_invoice' AND m.state = 'posted'
+              AND m.payment_state IN ('not_paid', 'partial')
+            GROUP BY 1
+        """)
+        unpaid = cr.fetchall()
+        return [
+            ('vet_test_open_visits', 'Draft and confirmed visits.', open_visits),
+            ('vet_test_unpaid_invoices', 'Posted customer invoices not fully paid.',
+             [({'branch': branch}, count) for branch, count, __ in unpaid]),
+            ('vet_test_unpaid_amount', 'Residual amount of the unpaid customer invoices.',
+             [({'branch': branch}, float(amount)) for branch, __, amount in unpaid]),
+        ]
@@ -0,0 +1,150 @@
+from odoo import api, fields, models, _
+from odoo.tools import create_index
+from collections import defaultdict
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Jobs taken by one cron run
+DELIVERY_BATCH_SIZE = 200
+# Attempts before a job is left failed for a manual retry
+DELIVERY_MAX_ATTEMPTS = 5
+# Minutes before the first retry; doubled after every further failure
+DELIVERY_RETRY_DELAY = 5
+
+
+class VetDeliveryJob(models.Model):
+    _name = 'vet.delivery.job'
+    _description = 'Vet Product Delivery Job'
+    _order = 'id desc'
+    _rec_name = 'visit_id'
+
+    visit_id = fields.Many2one('vet.animal.visit', string="Visit", required=True, index=True, ondelete='cascade')
+    invoice_id = fields.Many2one('account.move', string="Invoice", ondelete='set null')
+    analytic_account_id = fields.Many2one(related='visit_id.analytic_account_id', string="Branch")
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Delivered'),
+        ('failed', 'Failed'),
+    ], string="Status", default='pending', required=True, index=True)
+    attempts = fields.Integer(string="Attempts", readonly=True)
+    next_attempt = fields.Datetime(string="Next Attempt", default=fields.Datetime.now, readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+    picking_id = fields.Many2one('stock.picking', string="Picking", readonly=True, ondelete='set null')
+
+    @api.model
+    def _enqueue(self, invoices):
+        """Queue the delivery of the visits of posted ``invoices`` that still have products to deliver."""
+        visits = invoices.filtered(lambda m: m.move_type == 'out_invoice' and m.visit_id).visit_id
+        visits = visits.filtered(
+            lambda v: not v.delivered and v.line_ids.filtered(lambda l: l.product_id and l.quantity > 0 and not l.delivered)
+        )
+        if not visits:
+            return self
+        queued = self.search([('visit_id', 'in', visits.ids), ('state', '=', 'pending')]).visit_id
+        invoice_by_visit = {invoice.visit_id: invoice for invoice in invoices}
+        jobs = self.create([{
+            'visit_id': visit.id,
+            'invoice_id': invoice_by_visit[visit].id,
+        } for visit in visits - queued])
+        _logger.info("Queued delivery of %s visit(s)", len(jobs))
+        return jobs
+
+    def _process(self):
+        """Deliver the visits of these jobs together, one picking per warehouse.
+
+        When the batch fails, every job is tried on its own so that one
+        faulty visit does not hold back the others.
+        """
+        try:
+            with self.env.cr.savepoint():
+                self._deliver()
+            return
+        except Exception as e:
+            if len(self) == 1:
+                self._register_failure(e)
+                return
+            _logger.warning("Batch delivery of %s job(s) failed, retrying one by one: %s", len(self), e)
+        for job in self:
+            try:
+                with self.env.cr.savepoint():
+                    job._deliver()
+            except Exception as e:
+                job._register_failure(e)
+
+    def _deliver(self):
+        jobs = self._settle_previous_pickings()
+        pickings = jobs.visit_id._deliver_products()
+        for job in jobs:
+            picking = pickings.get(job.visit_id.id, self.env['stock.picking'])
+            if not job.visit_id.delivered:
+                # Kept on the job so that the next attempt cancels it instead of piling up pickings
+                job.picking_id = picking
+                job._register_failure(_("The picking was not completed, a backorder is waiting."))
+                continue
+            job.write({
+                'state': 'done',
+                'picking_id': picking.id,
+                'last_error': False,
+            })
+
+    def _settle_previous_pickings(self):
+        """Deal with the picking left by a previous attempt before a new one is made.
+
+        A picking that was validated by hand since completes its jobs; one
+        still open is cancelled so that the visit is not delivered twice.
+
+        :return: the jobs that still need a delivery
+        """
+        previous = self.picking_id
+        done = self.filtered(lambda j: j.picking_id.state == 'done')
+        if done:
+            done.visit_id.line_ids.filtered(lambda l: l.product_id and l.quantity > 0).write({'delivered': True})
+            done.visit_id.with_context(skip_visit_validation=True).write({'delivered': True})
+            done.write({'state': 'done', 'last_error': False})
+        open_pickings = previous.filtered(lambda p: p.state not in ('done', 'cancel'))
+        if open_pickings:
+            _logger.info("Cancelling %s picking(s) left open by a previous delivery attempt", len(open_pickings))
+            open_pickings.action_cancel()
+        return self - done
+
+    def _register_failure(self, error):
+        now = fields.Datetime.now()
+        for job in self:
+            attempts = job.attempts + 1
+            job.write({
+                'attempts': attempts,
+                'state': 'failed' if attempts >= DELIVERY_MAX_ATTEMPTS else 'pending',
+                'next_attempt': now + timedelta(minutes=DELIVERY_RETRY_DELAY * 2 ** (attempts - 1)),
+                'last_error': str(error),
+            })
+            _logger.warning("Delivery of visit %s failed (attempt %s): %s", job.visit_id.name, attempts, error)
+
+    def action_retry(self):
+        self.filtered(lambda j: j.state != 'done').write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
+        return True
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Drain the due jobs, committing after every warehouse batch."""
+        jobs = self.search([
+            ('state', '=', 'pending'),
+            ('next_attempt', '<=', fields.Datetime.now()),
+        ], order='next_attempt, id', limit=DELIVERY_BATCH_SIZE)
+        by_warehouse = defaultdict(lambda: self.browse())
+        for job in jobs:
+            by_warehouse[job.visit_id._get_delivery_warehouse()] |= job
+        for batch in by_warehouse.values():
+            batch._process()
+            self.env.cr.commit()
+        return len(jobs)
+
+    def init(self):
+        # Due jobs are looked up by the cron on every run
+        create_index(self._cr, 'vet_delivery_job_pending_index', self._table, ['next_attempt'],
+                     where="state = 'pending'")
@@ -0,0 +1,278 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from dateutil.relativedelta import relativedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+SERVICE_TYPES = [
+    ('service', 'Service'),
+    ('test', 'Test'),
+    ('vaccine', 'Vaccine'),
+]
+
+# One row per (new payment reconciliation, service type) of a visit invoice.
+# The revenue of a service type is the untaxed amount of its invoice lines,
+# with the fixed discount lines spread over the types pro rata, times the
+# paid share of the invoice. The most specific active rule (branch first,
+# then any branch) gives the percentage. Partials already turned into lines
+# are skipped, so a reconciliation committed late, whatever its id, is
+# still picked up by the next run; the unique key drops the rows a
+# concurrent run inserted first.
+_COLLECT_QUERY = """
+    INSERT INTO vet_doctor_commission_line (
+        partial_id, move_id, visit_id, doctor_id, analytic_account_id,
+        service_type, date, company_id, revenue, percent, commission
+    )
+    SELECT
+        p.id, m.id, v.id, v.doctor_id, v.analytic_account_id,
+        share.service_type, p.max_date, m.company_id,
+        share.revenue, COALESCE(r.percent, 0),
+        share.revenue * COALESCE(r.percent, 0) / 100
+    FROM account_partial_reconcile p
+    JOIN account_move_line debit ON debit.id = p.debit_move_id
+    JOIN account_move m ON m.id = debit.move_id
+    JOIN account_move_line credit ON credit.id = p.credit_move_id
+    JOIN account_move cm ON cm.id = credit.move_id
+    JOIN vet_animal_visit v ON v.id = m.visit_id
+    JOIN LATERAL (
+        SELECT typed.service_type,
+               SUM(typed.amount)
+                   * (1 + COALESCE(discount.amount / NULLIF(SUM(SUM(typed.amount)) OVER (), 0), 0))
+                   * p.amount / m.amount_total_signed AS revenue
+        FROM (
+            SELECT -aml.balance AS amount,
+                   (SELECT vl.service_type
+                    FROM vet_animal_visit_line vl
+                    WHERE vl.visit_id = v.id AND vl.product_id = aml.product_id AND vl.service_type IS NOT NULL
+                    ORDER BY vl.id
+                    LIMIT 1) AS service_type
+            FROM account_move_line aml
+            WHERE aml.move_id = m.id
+              AND aml.display_type = 'product'
+              AND aml.product_id IS NOT NULL
+        ) typed
+        CROSS JOIN (
+            SELECT COALESCE(SUM(-aml.balance), 0) AS amount
+            FROM account_move_line aml
+            WHERE aml.move_id = m.id
+              AND aml.display_type = 'product'
+              AND aml.product_id IS NULL
+              AND aml.balance > 0
+        ) discount
+        WHERE typed.service_type IS NOT NULL
+        GROUP BY typed.service_type, discount.amount
+        HAVING SUM(typed.amount) != 0
+    ) share ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT rule.percent
+        FROM vet_doctor_commission_rule rule
+        WHERE rule.active
+          AND rule.service_type = share.service_type
+          AND rule.company_id = m.company_id
+          AND (rule.analytic_account_id = v.analytic_account_id OR rule.analytic_account_id IS NULL)
+        ORDER BY rule.analytic_account_id NULLS LAST
+        LIMIT 1
+    ) r ON TRUE
+    WHERE m.move_type = 'out_invoice'
+      AND m.state = 'posted'
+      AND m.amount_total_signed != 0
+      AND cm.move_type != 'out_refund'
+      AND v.doctor_id IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM vet_doctor_commission_line l WHERE l.partial_id = p.id
+      )
+    ON CONFLICT (partial_id, service_type) DO NOTHING
+"""
+
+# A line of a closed statement whose reconciliation was undone is paid back
+# by a negative line on the next statement, so that paying the invoice again
+# does not earn the commission twice.
+_REVERSE_QUERY = """
+    INSERT INTO vet_doctor_commission_line (
+        reversed_id, move_id, visit_id, doctor_id, analytic_account_id,
+        service_type, date, company_id, revenue, percent, commission
+    )
+    SELECT
+        l.id, l.move_id, l.visit_id, l.doctor_id, l.analytic_account_id,
+        l.service_type, %s, l.company_id, -l.revenue, l.percent, -l.commission
+    FROM vet_doctor_commission_line l
+    JOIN vet_doctor_commission s ON s.id = l.statement_id
+    WHERE s.state = 'done'
+      AND l.partial_id IS NULL
+      AND l.reversed_id IS NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM vet_doctor_commission_line rev WHERE rev.reversed_id = l.id
+      )
+"""
+
+
+class VetDoctorCommissionRule(models.Model):
+    _name = 'vet.doctor.commission.rule'
+    _description = 'Doctor Commission Rule'
+    _order = 'service_type, analytic_account_id'
+
+    service_type = fields.Selection(SERVICE_TYPES, string="Service Type", required=True, default='service')
+    analytic_account_id = fields.Many2one(
+        'account.analytic.account',
+        string="Branch",
+        help="Leave empty to apply the rule to every branch without a rule of its own."
+    )
+    percent = fields.Float(string="Commission (%)", required=True, default=0.0)
+    company_id = fields.Many2one('res.company', string="Company", required=True, default=lambda self: self.env.company)
+    active = fields.Boolean(default=True)
+
+    _sql_constraints = [
+        ('percent_range', 'CHECK(percent >= 0 AND percent <= 100)', 'The commission must be between 0 and 100%.'),
+    ]
+
+
+class VetDoctorCommissionLine(models.Model):
+    _name = 'vet.doctor.commission.line'
+    _description = 'Doctor Commission Line'
+    _order = 'date desc, id desc'
+    _log_access = False
+
+    partial_id = fields.Many2one('account.partial.reconcile', string="Reconciliation", index=True, ondelete='set null', readonly=True)
+    move_id = fields.Many2one('account.move', string="Invoice", readonly=True)
+    visit_id = fields.Many2one('vet.animal.visit', string="Visit", readonly=True)
+    doctor_id = fields.Many2one('vet.animal.doctor', string="Doctor", index=True, readonly=True)
+    analytic_account_id = fields.Many2one('account.analytic.account', string="Branch", readonly=True)
+    service_type = fields.Selection(SERVICE_TYPES, string="Service Type", readonly=True)
+    date = fields.Date(string="Payment Date", index=True, readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string="Currency")
+    revenue = fields.Monetary(string="Paid Revenue", currency_field='currency_id', readonly=True)
+    percent = fields.Float(string="Commission (%)", readonly=True)
+    commission = fields.Monetary(string="Commission", currency_field='currency_id', readonly=True)
+    statement_id = fields.Many2one('vet.doctor.commission', string="Statement", index=True, ondelete='set null', readonly=True)
+    reversed_id = fields.Many2one('vet.doctor.commission.line', string="Reversal Of", index='btree_not_null', readonly=True)
+
+    _sql_constraints = [
+        ('partial_service_type_uniq', 'unique(partial_id, service_type)',
+         'A reconciliation earns one commission line per service type.'),
+    ]
+
+
+class VetDoctorCommission(models.Model):
+    _name = 'vet.doctor.commission'
+    _description = 'Doctor Commission Statement'
+    _order = 'date_to desc, doctor_id'
+
+    name = fields.Char(string="Reference", required=True, readonly=True)
+    doctor_id = fields.Many2one('vet.animal.doctor', string="Doctor", required=True, index=True, readonly=True)
+    analytic_account_id = fields.Many2one('account.analytic.account', string="Branch", readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", required=True, readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string="Currency")
+    date_from = fields.Date(string="From", required=True, readonly=True)
+    date_to = fields.Date(string="To", required=True, readonly=True)
+    line_ids = fields.One2many('vet.doctor.commission.line', 'statement_id', string="Lines", readonly=True)
+    revenue = fields.Monetary(string="Paid Revenue", currency_field='currency_id', readonly=True)
+    commission = fields.Monetary(string="Commission", currency_field='currency_id', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('done', 'Closed'),
+    ], string="Status", default='draft', required=True, readonly=True)
+
+    @api.model
+    def _collect_payments(self):
+        """Turn the payments reconciled since the last run into commission lines.
+
+        Lines whose reconciliation was undone lose their ``partial_id``; they
+        are dropped as long as no closed statement holds them, and reversed
+        by a negative line otherwise.
+        """
+        for model in ('account.move', 'account.move.line', 'account.partial.reconcile',
+                      'vet.animal.visit', 'vet.animal.visit.line', 'vet.doctor.commission.rule'):
+            self.env[model].flush_model()
+        cr = self._cr
+        cr.execute("""
+            DELETE FROM vet_doctor_commission_line l
+            WHERE l.partial_id IS NULL
+              AND l.reversed_id IS NULL
+              AND (l.statement_id IS NULL OR l.statement_id IN (
+                  SELECT id FROM vet_doctor_commission WHERE state = 'draft'
+              ))
+        """)
+        if cr.rowcount:
+            cr.execute("""
+                UPDATE vet_doctor_commission s
+                SET revenue = COALESCE(t.revenue, 0), commission = COALESCE(t.commission, 0)
+                FROM vet_doctor_commission d
+                LEFT JOIN LATERAL (
+                    SELECT SUM(revenue) AS revenue, SUM(commission) AS commission
+                    FROM vet_doctor_commission_line WHERE statement_id = d.id
+                ) t ON TRUE
+                WHERE s.id = d.id AND d.state = 'draft'
+            """)
+            self.invalidate_model(['revenue', 'commission'])
+        cr.execute(_REVERSE_QUERY, (fields.Date.context_today(self),))
+        reversed_count = cr.rowcount
+
+        cr.execute(_COLLECT_QUERY)
+        collected = cr.rowcount
+        self.env['vet.doctor.commission.line'].invalidate_model()
+        _logger.info("Doctor commissions: %s new line(s) collected, %s reversed", collected, reversed_count)
+        return collected
+
+    @api.model
+    def _close_period(self, date_from, date_to):
+        """Create the draft statements of [date_from, date_to] per doctor and branch.
+
+        Lines not yet on a statement are taken up to ``date_to``, so payments
+        dated in an already closed period land on the next statement.
+        """
+        self._collect_payments()
+        self.env['vet.doctor.commission.line'].flush_model()
+        cr = self._cr
+        cr.execute("""
+            SELECT l.doctor_id, l.analytic_account_id, l.company_id, SUM(l.revenue), SUM(l.commission)
+            FROM vet_doctor_commission_line l
+            WHERE l.statement_id IS NULL AND l.date <= %s
+              AND (l.partial_id IS NOT NULL OR l.reversed_id IS NOT NULL)
+            GROUP BY l.doctor_id, l.analytic_account_id, l.company_id
+        """, (date_to,))
+        groups = cr.fetchall()
+        if not groups:
+            return self.browse()
+
+        doctors = self.env['vet.animal.doctor'].browse({row[0] for row in groups})
+        doctor_names = dict(zip(doctors.ids, doctors.mapped('name')))
+        statements = self.create([{
+            'name': _("%(doctor)s %(date_from)s - %(date_to)s",
+                      doctor=doctor_names.get(doctor_id, ''), date_from=date_from, date_to=date_to),
+            'doctor_id': doctor_id,
+            'analytic_account_id': branch_id,
+            'company_id': company_id,
+            'date_from': date_from,
+            'date_to': date_to,
+            'revenue': revenue,
+            'commission': commission,
+        } for doctor_id, branch_id, company_id, revenue, commission in groups])
+        self.flush_model()
+        cr.execute("""
+            UPDATE vet_doctor_commission_line l
+            SET statement_id = s.id
+            FROM vet_doctor_commission s
+            WHERE s.id IN %s
+              AND l.statement_id IS NULL AND l.date <= %s
+              AND (l.partial_id IS NOT NULL OR l.reversed_id IS NOT NULL)
+              AND l.doctor_id = s.doctor_id
+              AND l.analytic_account_id IS NOT DISTINCT FROM s.analytic_account_id
+              AND l.company_id = s.company_id
+        """, (tuple(statements.ids), date_to))
+        self.env['vet.doctor.commission.line'].invalidate_model(['statement_id'])
+        _logger.info("Doctor commissions: %s statement(s) created for %s - %s", len(statements), date_from, date_to)
+        return statements
+
+    @api.model
+    def _cron_close_previous_month(self):
+        first_day = fields.Date.context_today(self).replace(day=1)
+        return self._close_period(first_day - relativedelta(months=1), first_day - relativedelta(days=1))
+
+    def action_done(self):
+        """Freeze the statement: its lines are no longer dropped when a payment is unreconciled."""
+        if any(statement.state == 'done' for statement in self):
+            raise UserError(_("This commission statement is already closed."))
+        self.write({'state': 'done'})
+        return True
@@ -0,0 +1,288 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import config
+import csv
+import gzip
+import logging
+import os
+
+from ..tools import replica
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+_logger = logging.getLogger(__name__)
+
+# Rows per keyset chunk (and per Parquet row group / Arrow record batch)
+EXPORT_CHUNK_SIZE = 20000
+# Rows written less than this many seconds ago are left for the next run, so
+# transactions still in flight when the export starts are not skipped.
+EXPORT_LAG = 600
+
+# dataset -> (base table, FROM clause with alias t, [(column expression, name, type)])
+# The column list is the file schema: append to it, never reorder or retype.
+EXPORT_DATASETS = {
+    'visit': ('vet_animal_visit', """
+        vet_animal_visit t
+        LEFT JOIN account_analytic_account b ON b.id = t.analytic_account_id
+        LEFT JOIN vet_animal_doctor d ON d.id = t.doctor_id
+    """, [
+        ("t.id", 'id', 'int64'),
+        ("t.name", 'name', 'string'),
+        ("t.date", 'date', 'timestamp'),
+        ("t.state", 'state', 'string'),
+        ("t.payment_state", 'payment_state', 'string'),
+        ("t.payment_method", 'payment_method', 'string'),
+        ("t.analytic_account_id", 'branch_id', 'int64'),
+        ("b.name->>'en_US'", 'branch', 'string'),
+        ("t.doctor_id", 'doctor_id', 'int64'),
+        ("d.name", 'doctor', 'string'),
+        ("t.animal_id", 'animal_id', 'int64'),
+        ("t.owner_id", 'owner_id', 'int64'),
+        ("t.treatment_charge", 'treatment_charge', 'float64'),
+        ("t.discount_percent", 'discount_percent', 'float64'),
+        ("t.discount_fixed", 'discount_fixed', 'float64'),
+        ("t.subtotal", 'subtotal', 'float64'),
+        ("t.total_amount", 'total_amount', 'float64'),
+        ("t.write_date", 'write_date', 'timestamp'),
+    ]),
+    'visit_line': ('vet_animal_visit_line', """
+        vet_animal_visit_line t
+        LEFT JOIN vet_animal_visit v ON v.id = t.visit_id
+        LEFT JOIN vet_service s ON s.id = t.service_id
+        LEFT JOIN account_analytic_account b ON b.id = v.analytic_account_id
+        LEFT JOIN vet_animal_doctor d ON d.id = v.doctor_id
+    """, [
+        ("t.id", 'id', 'int64'),
+        ("t.visit_id", 'visit_id', 'int64'),
+        ("v.date", 'visit_date', 'timestamp'),
+        ("t.service_id", 'service_id', 'int64'),
+        ("s.name", 'service', 'string'),
+        ("t.service_type", 'service_type', 'string'),
+        ("t.product_id", 'product_id', 'int64'),
+        ("t.quantity", 'quantity', 'float64'),
+        ("t.price_unit", 'price_unit', 'float64'),
+        ("t.subtotal", 'subtotal', 'float64'),
+        ("t.invoiced", 'invoiced', 'bool'),
+        ("t.delivered", 'delivered', 'bool'),
+        ("v.payment_method", 'payment_method', 'string'),
+        ("v.analytic_account_id", 'branch_id', 'int64'),
+        ("b.name->>'en_US'", 'branch', 'string'),
+        ("v.doctor_id", 'doctor_id', 'int64'),
+        ("d.name", 'doctor', 'string'),
+        ("t.write_date", 'write_date', 'timestamp'),
+    ]),
+    'invoice': ('account_move', """
+        account_move t
+        LEFT JOIN vet_animal_visit v ON v.id = t.visit_id
+        LEFT JOIN account_analytic_account b ON b.id = t.analytic_account_id
+        LEFT JOIN vet_animal_doctor d ON d.id = v.doctor_id
+    """, [
+        ("t.id", 'id', 'int64'),
+        ("t.name", 'name', 'string'),
+        ("t.move_type", 'move_type', 'string'),
+        ("t.state", 'state', 'string'),
+        ("t.payment_state", 'payment_state', 'string'),
+        ("t.payment_method", 'payment_method', 'string'),
+        ("t.invoice_date", 'invoice_date', 'date'),
+        ("t.invoice_date_due", 'invoice_date_due', 'date'),
+        ("t.partner_id", 'partner_id', 'int64'),
+        ("t.visit_id", 'visit_id', 'int64'),
+        ("t.analytic_account_id", 'branch_id', 'int64'),
+        ("b.name->>'en_US'", 'branch', 'string'),
+        ("v.doctor_id", 'doctor_id', 'int64'),
+        ("d.name", 'doctor', 'string'),
+        ("t.company_id", 'company_id', 'int64'),
+        ("t.amount_untaxed_signed::float8", 'amount_untaxed', 'float64'),
+        ("t.amount_total_signed::float8", 'amount_total', 'float64'),
+        ("t.amount_residual_signed::float8", 'amount_residual', 'float64'),
+        ("t.write_date", 'write_date', 'timestamp'),
+    ]),
+}
+
+# Extra filter on the base table of a dataset
+EXPORT_DATASET_FILTERS = {
+    'invoice': "t.move_type IN ('out_invoice', 'out_refund')",
+}
+
+FORMAT_EXTENSIONS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'csv': '.csv.gz',
+}
+
+
+def _arrow_type(type_name):
+    return {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'bool': pa.bool_(),
+        'string': pa.string(),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us'),
+    }[type_name]
+
+
+class VetExportJob(models.Model):
+    _name = 'vet.export.job'
+    _description = 'Vet Analytics Export'
+    _order = 'dataset'
+
+    name = fields.Char(string="Name", required=True)
+    dataset = fields.Selection([
+        ('visit', 'Visits'),
+        ('visit_line', 'Visit Lines'),
+        ('invoice', 'Invoices'),
+    ], string="Dataset", required=True)
+    file_format = fields.Selection([
+        ('auto', 'Best Available'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow IPC'),
+        ('csv', 'CSV (gzip)'),
+    ], string="Format", required=True, default='auto',
+        help="Best Available writes Parquet when pyarrow.parquet is installed, "
+             "Arrow IPC with pyarrow alone, and gzipped CSV otherwise.")
+    directory = fields.Char(
+        string="Directory",
+        help="Server directory receiving the files. Defaults to vet_exports/<database> in the data directory."
+    )
+    last_write_date = fields.Datetime(string="Exported Up To", readonly=True, copy=False)
+    last_id = fields.Integer(string="Last Exported ID", readonly=True, copy=False)
+    last_file = fields.Char(string="Last File", readonly=True, copy=False)
+    last_row_count = fields.Integer(string="Last Row Count", readonly=True, copy=False)
+    active = fields.Boolean(default=True)
+
+    def _get_format(self):
+        self.ensure_one()
+        file_format = self.file_format
+        if file_format == 'auto':
+            file_format = 'parquet' if pq else 'arrow' if pa else 'csv'
+        if file_format == 'parquet' and not pq:
+            raise UserError(_("Parquet export requires the pyarrow Python package."))
+        if file_format == 'arrow' and not pa:
+            raise UserError(_("Arrow export requires the pyarrow Python package."))
+        return file_format
+
+    def _get_directory(self):
+        self.ensure_one()
+        directory = self.directory or os.path.join(config['data_dir'], 'vet_exports', self._cr.dbname)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _iter_chunks(self, cr, upper_bound):
+        """Yield the dataset rows changed after the watermark in keyset chunks.
+
+        Each chunk is one indexed range query on (write_date, id), so memory
+        stays bounded by EXPORT_CHUNK_SIZE whatever the table size.
+        """
+        self.ensure_one()
+        __, from_clause, columns = EXPORT_DATASETS[self.dataset]
+        select = ', '.join(expr for expr, __, __ in columns)
+        extra = EXPORT_DATASET_FILTERS.get(self.dataset)
+        extra = f"AND {extra}" if extra else ""
+        write_date, last_id = self.last_write_date or fields.Datetime.to_datetime('1970-01-01'), self.last_id or 0
+        while True:
+            cr.execute(f"""
+                SELECT {select}
+                FROM {from_clause}
+                WHERE (t.write_date, t.id) > (%s, %s) AND t.write_date <= %s {extra}
+                ORDER BY t.write_date, t.id
+                LIMIT %s
+            """, (write_date, last_id, upper_bound, EXPORT_CHUNK_SIZE))
+            rows = cr.fetchall()
+            if not rows:
+                return
+            yield rows
+            # id and write_date are the first and last columns of every dataset
+            write_date, last_id = rows[-1][-1], rows[-1][0]
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                return
+
+    def _export(self):
+        """Write the rows changed since the previous run to a new file and
+        move the watermark past them."""
+        self.ensure_one()
+        table, __, columns = EXPORT_DATASETS[self.dataset]
+        file_format = self._get_format()
+        self.env.flush_all()
+        cr = self._cr
+        cr.execute("SELECT (now() AT TIME ZONE 'UTC') - %s * interval '1 second'", (EXPORT_LAG,))
+        upper_bound = cr.fetchone()[0]
+        stamp = fields.Datetime.now().strftime('%Y%m%d%H%M%S')
+        path = os.path.join(self._get_directory(), f"{self.dataset}-{stamp}{FORMAT_EXTENSIONS[file_format]}")
+        names = [name for __, name, __ in columns]
+
+        # Rows are read on the reporting replica when one is configured; its
+        # allowed lag stays well under EXPORT_LAG, so no row below the bound is missed.
+        with replica.reporting_env(self.env) as reporting_env:
+            count = 0
+            last_row = None
+            writer = None
+            try:
+                if file_format == 'csv':
+                    writer = gzip.open(path, 'wt', newline='')
+                    csv_writer = csv.writer(writer)
+                    csv_writer.writerow(names)
+                else:
+                    schema = pa.schema([(name, _arrow_type(type_name)) for __, name, type_name in columns])
+                    if file_format == 'parquet':
+                        writer = pq.ParquetWriter(path, schema, compression='zstd')
+                    else:
+                        writer = pa.ipc.new_file(path, schema)
+                for rows in self._iter_chunks(reporting_env.cr, upper_bound):
+                    if file_format == 'csv':
+                        csv_writer.writerows(rows)
+                    else:
+                        batch = pa.RecordBatch.from_arrays(
+                            [pa.array(column, type=schema.field(i).type) for i, column in enumerate(zip(*rows))],
+                            schema=schema,
+                        )
+                        if file_format == 'parquet':
+                            writer.write_batch(batch)
+                        else:
+                            writer.write(batch)
+                    count += len(rows)
+                    last_row = rows[-1]
+            except Exception:
+                if writer is not None:
+                    writer.close()
+                if os.path.exists(path):
+                    os.unlink(path)
+                raise
+            writer.close()
+
+        if not count:
+            os.unlink(path)
+            _logger.info("Vet export %s: nothing changed since %s", self.name, self.last_write_date)
+            return False
+        self.write({
+            'last_write_date': last_row[-1],
+            'last_id': last_row[0],
+            'last_file': path,
+            'last_row_count': count,
+        })
+        _logger.info("Vet export %s: %s row(s) of %s written to %s", self.name, count, table, path)
+        return path
+
+    def action_export(self):
+        for job in self:
+            job._export()
+        return True
+
+    def action_reset(self):
+        """Export everything again on the next run."""
+        self.write({'last_write_date': False, 'last_id': 0})
+        return True
+
+    @api.model
+    def _cron_export(self):
+        for job in self.search([]):
+            job._export()
+            # Keep each finished export even if a later job fails
+            self.env.cr.commit()
@@ -0,0 +1,171 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from datetime import timedelta
+import logging
+
+from ..tools import replica
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_logger = logging.getLogger(__name__)
+
+# Days of history the model is fitted on
+FORECAST_HISTORY_DAYS = 5 * 365
+# Days forecast ahead; the 30 day horizon is the first part of it
+FORECAST_HORIZON_DAYS = 90
+
+
+def _design_matrix(days, origin, history_days):
+    """Rows [1, trend, weekday dummies, month dummies] for the given dates.
+
+    Monday and January are the baselines, so the matrix has 1 + 1 + 6 + 11
+    columns; the trend is in units of the history length to keep the
+    normal equations well conditioned.
+    """
+    offsets = np.array([(day - origin).days for day in days], dtype=float)
+    weekdays = np.array([day.weekday() for day in days])
+    months = np.array([day.month for day in days])
+    return np.column_stack([
+        np.ones(len(days)),
+        offsets / history_days,
+        weekdays[:, None] == np.arange(1, 7)[None, :],
+        months[:, None] == np.arange(2, 13)[None, :],
+    ]).astype(float)
+
+
+class VetForecast(models.Model):
+    _name = 'vet.forecast'
+    _description = 'Vet Branch Forecast'
+    _order = 'date, analytic_account_id'
+    _rec_name = 'date'
+    _log_access = False
+
+    date = fields.Date(string="Date", required=True, index=True, readonly=True)
+    days_ahead = fields.Integer(string="Days Ahead", readonly=True)
+    analytic_account_id = fields.Many2one('account.analytic.account', string="Branch", index=True, readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string="Currency")
+    visit_count = fields.Float(string="Forecast Visits", digits=(16, 1), readonly=True)
+    revenue = fields.Monetary(string="Forecast Revenue", currency_field='currency_id', readonly=True)
+    computed_at = fields.Datetime(string="Computed On", readonly=True)
+
+    @api.model
+    def _load_history(self, date_from, date_to):
+        """Daily visit counts and invoiced revenue per branch as two T x B arrays.
+
+        Visits are counted on their local day, in the timezone of the
+        branch's company (the user's when the company has none), like the
+        waiting room does; revenue is already keyed by invoice date.
+        """
+        self.env['vet.animal.visit'].flush_model(['date', 'state', 'analytic_account_id'])
+        self.env['vet.revenue.daily'].flush_model()
+        cr = self._cr
+        cr.execute("""
+            SELECT day.branch_id, day.local_date, COUNT(*)
+            FROM (
+                SELECT v.analytic_account_id AS branch_id,
+                       (v.date AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(p.tz, %(tz)s))::date AS local_date
+                FROM vet_animal_visit v
+                JOIN account_analytic_account a ON a.id = v.analytic_account_id
+                LEFT JOIN res_company c ON c.id = a.company_id
+                LEFT JOIN res_partner p ON p.id = c.partner_id
+                WHERE v.state != 'cancel'
+                  AND v.date >= %(start)s AND v.date < %(end)s
+            ) day
+            WHERE day.local_date BETWEEN %(date_from)s AND %(date_to)s
+            GROUP BY 1, 2
+        """, {
+            'tz': self.env.context.get('tz') or self.env.user.tz or 'UTC',
+            # One day of margin on each side covers every UTC offset
+            'start': date_from - timedelta(days=1),
+            'end': date_to + timedelta(days=2),
+            'date_from': date_from,
+            'date_to': date_to,
+        })
+        visits = cr.fetchall()
+        cr.execute("""
+            SELECT analytic_account_id, date, SUM(amount_total)
+            FROM vet_revenue_daily
+            WHERE analytic_account_id IS NOT NULL AND date BETWEEN %s AND %s
+            GROUP BY 1, 2
+        """, (date_from, date_to))
+        revenue = cr.fetchall()
+
+        branch_ids = sorted({row[0] for row in visits} | {row[0] for row in revenue})
+        column = {branch_id: index for index, branch_id in enumerate(branch_ids)}
+        length = (date_to - date_from).days + 1
+        visit_matrix = np.zeros((length, len(branch_ids)))
+        revenue_matrix = np.zeros((length, len(branch_ids)))
+        for matrix, rows in ((visit_matrix, visits), (revenue_matrix, revenue)):
+            for branch_id, day, value in rows:
+                matrix[(day - date_from).days, column[branch_id]] = float(value or 0.0)
+        return branch_ids, visit_matrix, revenue_matrix
+
+    @api.model
+    def _compute_forecast(self):
+        """Fit the seasonal model on every branch at once and replace the forecast.
+
+        Visits and revenue of all branches are the columns of one target
+        matrix, so a single pseudo-inverse of the shared design matrix fits
+        every series together.
+        """
+        if np is None:
+            raise UserError(_("Forecasting requires the numpy Python package."))
+        today = fields.Date.context_today(self)
+        date_to = today - timedelta(days=1)
+        date_from = today - timedelta(days=FORECAST_HISTORY_DAYS)
+        with replica.reporting_env(self.env) as env:
+            branch_ids, visit_matrix, revenue_matrix = self.with_env(env)._load_history(date_from, date_to)
+        if not branch_ids:
+            _logger.info("Vet forecast: no history to fit")
+            return 0
+
+        # Fit from the first day with activity, not from the window start
+        active_rows = np.flatnonzero(visit_matrix.any(axis=1) | revenue_matrix.any(axis=1))
+        first = int(active_rows[0])
+        history = [date_from + timedelta(days=offset) for offset in range(first, visit_matrix.shape[0])]
+        future = [today + timedelta(days=offset) for offset in range(FORECAST_HORIZON_DAYS)]
+        origin, span = history[0], max(len(history), 1)
+
+        targets = np.hstack([visit_matrix[first:], revenue_matrix[first:]])
+        coefficients = np.linalg.pinv(_design_matrix(history, origin, span)) @ targets
+        predictions = np.clip(_design_matrix(future, origin, span) @ coefficients, 0.0, None)
+        branches = len(branch_ids)
+        visit_forecast, revenue_forecast = predictions[:, :branches], predictions[:, branches:]
+
+        # One row per (day, branch), passed as column arrays to a single INSERT
+        days = np.repeat(np.arange(FORECAST_HORIZON_DAYS), branches)
+        columns = np.tile(np.arange(branches), FORECAST_HORIZON_DAYS)
+        cr = self._cr
+        cr.execute("DELETE FROM vet_forecast")
+        # The company is the branch's, whichever company the cron runs in
+        cr.execute("""
+            INSERT INTO vet_forecast (date, days_ahead, analytic_account_id, company_id, visit_count, revenue, computed_at)
+            SELECT f.day, f.days_ahead, f.branch_id, COALESCE(a.company_id, %s), f.visits, f.revenue, %s
+            FROM unnest(%s::date[], %s::int[], %s::int[], %s::float8[], %s::numeric[])
+                AS f(day, days_ahead, branch_id, visits, revenue)
+            JOIN account_analytic_account a ON a.id = f.branch_id
+        """, (
+            self.env.company.id,
+            fields.Datetime.now(),
+            [future[day] for day in days],
+            (days + 1).tolist(),
+            [branch_ids[column] for column in columns],
+            np.round(visit_forecast[days, columns], 1).tolist(),
+            np.round(revenue_forecast[days, columns], 2).tolist(),
+        ))
+        rows = cr.rowcount
+        self.invalidate_model()
+        _logger.info("Vet forecast: %s branch(es) fitted on %s day(s), %s row(s) written",
+                     branches, len(history), rows)
+        return rows
+
+    @api.model
+    def _cron_compute_forecast(self):
+        if np is None:
+            _logger.warning("Vet forecast skipped: numpy is not installed")
+            return 0
+        return self._compute_forecast()
@@ -0,0 +1,16 @@
+from odoo import fields, models
+
+
+class VetMetricsFlow(models.Model):
+    """Flow counters shared by all server processes; see tools/metrics.py."""
+    _name = 'vet.metrics.flow'
+    _description = 'Vet Flow Metrics'
+    _log_access = False
+
+    flow = fields.Char(string="Flow", required=True, readonly=True)
+    metric = fields.Char(string="Metric", required=True, readonly=True)
+    value = fields.Float(string="Value", readonly=True)
+
+    _sql_constraints = [
+        ('flow_metric_uniq', 'unique(flow, metric)', 'One row per flow and metric.'),
+    ]
@@ -0,0 +1,432 @@
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from collections import defaultdict
+from datetime import date, datetime
+import base64
+import csv
+import io
+import logging
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+_logger = logging.getLogger(__name__)
+
+# Payments created, posted and reconciled per batch
+IMPORT_BATCH_SIZE = 500
+# Accepted header names of each column, lowercase
+IMPORT_COLUMNS = {
+    'reference': ('reference', 'ref', 'phone', 'contact', 'mobile', 'customer'),
+    'amount': ('amount', 'paid', 'payment'),
+    'date': ('date', 'payment date', 'value date'),
+}
+IMPORT_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%m/%d/%Y')
+
+
+def _fifo_allocate(invoice_partners, invoice_cents, payment_partners, payment_cents):
+    """Allocate payments to invoices of the same partner, both oldest first.
+
+    Both sides are given sorted by partner and, within a partner, in FIFO
+    order, as integer amounts in the smallest currency unit.
+
+    :return: [(invoice index, payment index, amount)] in allocation order
+    """
+    if not invoice_cents or not payment_cents:
+        return []
+    if np is None:
+        return _fifo_allocate_python(invoice_partners, invoice_cents, payment_partners, payment_cents)
+
+    inv_partners = np.asarray(invoice_partners, dtype=np.int64)
+    inv_amounts = np.asarray(invoice_cents, dtype=np.int64)
+    pay_partners = np.asarray(payment_partners, dtype=np.int64)
+    pay_amounts = np.asarray(payment_cents, dtype=np.int64)
+
+    # Each partner owns the interval [base, base + span) of one shared axis;
+    # its invoices and payments are laid out from base as cumulative intervals.
+    partners = np.union1d(inv_partners, pay_partners)
+    inv_index = np.searchsorted(partners, inv_partners)
+    pay_index = np.searchsorted(partners, pay_partners)
+    inv_total = np.zeros(len(partners), dtype=np.int64)
+    pay_total = np.zeros(len(partners), dtype=np.int64)
+    np.add.at(inv_total, inv_index, inv_amounts)
+    np.add.at(pay_total, pay_index, pay_amounts)
+    span = np.maximum(inv_total, pay_total)
+    base = np.cumsum(span) - span
+
+    inv_end = base[inv_index] + np.cumsum(inv_amounts) - (np.cumsum(inv_total) - inv_total)[inv_index]
+    pay_end = base[pay_index] + np.cumsum(pay_amounts) - (np.cumsum(pay_total) - pay_total)[pay_index]
+    inv_start = inv_end - inv_amounts
+    pay_start = pay_end - pay_amounts
+
+    # Between two consecutive interval bounds one invoice at most meets one
+    # payment at most: the overlap of both is the allocated amount.
+    points = np.unique(np.concatenate([inv_start, inv_end, pay_start, pay_end]))
+    low, high = points[:-1], points[1:]
+    invoice = np.searchsorted(inv_end, low, side='right')
+    payment = np.searchsorted(pay_end, low, side='right')
+    valid = (invoice < len(inv_amounts)) & (payment < len(pay_amounts))
+    invoice, payment, low, high = invoice[valid], payment[valid], low[valid], high[valid]
+    valid = (inv_start[invoice] <= low) & (pay_start[payment] <= low)
+    return list(zip(invoice[valid].tolist(), payment[valid].tolist(), (high - low)[valid].tolist()))
+
+
+def _fifo_allocate_python(invoice_partners, invoice_cents, payment_partners, payment_cents):
+    """Two-pointer equivalent of :func:`_fifo_allocate` when numpy is missing."""
+    allocations = []
+    invoice_left, payment_left = list(invoice_cents), list(payment_cents)
+    i = p = 0
+    while i < len(invoice_left) and p < len(payment_left):
+        if invoice_partners[i] < payment_partners[p]:
+            i += 1
+            continue
+        if invoice_partners[i] > payment_partners[p]:
+            p += 1
+            continue
+        amount = min(invoice_left[i], payment_left[p])
+        if amount > 0:
+            allocations.append((i, p, amount))
+            invoice_left[i] -= amount
+            payment_left[p] -= amount
+        if invoice_left[i] <= 0:
+            i += 1
+        if payment_left[p] <= 0:
+            p += 1
+    return allocations
+
+
+def _normalize_phone(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def _parse_amount(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace(',', '').replace(' ', ''))
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value or '').strip()
+    if not value:
+        return None
+    for date_format in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value[:10], date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(_("Unrecognised date %s") % value)
+
+
+class VetPaymentImport(models.TransientModel):
+    _name = 'vet.payment.import'
+    _description = 'Vet Bulk Payment Import'
+
+    file = fields.Binary(string="File", required=True)
+    filename = fields.Char(string="File Name")
+    journal_id = fields.Many2one(
+        'account.journal',
+        string="Journal",
+        domain="[('type', 'in', ('cash', 'bank'))]",
+        required=True,
+    )
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('preview', 'Preview'),
+        ('done', 'Imported'),
+    ], string="Status", default='draft')
+    line_ids = fields.One2many('vet.payment.import.line', 'import_id', string="Rows")
+    currency_id = fields.Many2one(related='journal_id.company_id.currency_id')
+    row_count = fields.Integer(string="Rows", compute='_compute_summary')
+    matched_count = fields.Integer(string="Matched", compute='_compute_summary')
+    amount_total = fields.Monetary(string="Amount to Import", compute='_compute_summary', currency_field='currency_id')
+    amount_allocated = fields.Monetary(string="Allocated to Invoices", compute='_compute_summary', currency_field='currency_id')
+
+    @api.depends('line_ids.status', 'line_ids.amount', 'line_ids.allocated')
+    def _compute_summary(self):
+        for wizard in self:
+            importable = wizard.line_ids.filtered(lambda l: l.status in ('matched', 'credit'))
+            wizard.row_count = len(wizard.line_ids)
+            wizard.matched_count = len(importable)
+            wizard.amount_total = sum(importable.mapped('amount'))
+            wizard.amount_allocated = sum(importable.mapped('allocated'))
+
+    def _read_rows(self):
+        """[(row number, {column: raw value})] of the uploaded CSV or XLSX file."""
+        self.ensure_one()
+        content = base64.b64decode(self.file or b'')
+        if (self.filename or '').lower().endswith('.xlsx') or content[:2] == b'PK':
+            if openpyxl is None:
+                raise UserError(_("Importing XLSX files requires the openpyxl Python package. Save the file as CSV instead."))
+            workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+            rows = list(workbook.active.iter_rows(values_only=True))
+        else:
+            text = content.decode('utf-8-sig')
+            try:
+                dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            rows = list(csv.reader(io.StringIO(text), dialect))
+        if not rows:
+            raise UserError(_("The file is empty."))
+
+        header = [str(cell or '').strip().lower() for cell in rows[0]]
+        positions = {}
+        for column, names in IMPORT_COLUMNS.items():
+            position = next((index for index, name in enumerate(header) if name in names), None)
+            if position is not None:
+                positions[column] = position
+        missing = {'reference', 'amount'} - set(positions)
+        if missing:
+            raise UserError(_("Missing column(s) %s. Expected a header with reference (or phone), amount and date.")
+                            % ', '.join(sorted(missing)))
+        return [
+            (number, {column: row[position] if position < len(row) else None for column, position in positions.items()})
+            for number, row in enumerate(rows[1:], start=2)
+            if any(cell not in (None, '') for cell in row)
+        ]
+
+    @api.model
+    def _match_partners(self, references):
+        """{reference: [partner ids]} of the owners whose contact reference or phone matches."""
+        phones = {reference: _normalize_phone(reference) for reference in references}
+        self.env['res.partner'].flush_model(['phone', 'ref'])
+        self.env['vet.animal.owner'].flush_model(['partner_id'])
+        self._cr.execute("""
+            SELECT DISTINCT p.id, p.ref, regexp_replace(COALESCE(p.phone, ''), '[^0-9]', '', 'g')
+            FROM vet_animal_owner o
+            JOIN res_partner p ON p.id = o.partner_id
+            WHERE p.ref = ANY(%s)
+               OR regexp_replace(COALESCE(p.phone, ''), '[^0-9]', '', 'g') = ANY(%s)
+        """, (list(references), [phone for phone in phones.values() if phone]))
+        by_ref, by_phone = defaultdict(set), defaultdict(set)
+        for partner_id, ref, phone in self._cr.fetchall():
+            if ref:
+                by_ref[ref].add(partner_id)
+            if phone:
+                by_phone[phone].add(partner_id)
+        # An exact contact reference wins over a phone number
+        return {
+            reference: sorted(by_ref.get(reference) or by_phone.get(phones[reference]) or ())
+            for reference in references
+        }
+
+    @api.model
+    def _open_invoices(self, partner_ids, company):
+        """(partner ids, invoice ids, residuals) of the open customer invoices, oldest first per partner."""
+        self.env['account.move'].flush_model(
+            ['partner_id', 'move_type', 'state', 'payment_state', 'amount_residual', 'invoice_date', 'company_id']
+        )
+        self._cr.execute("""
+            SELECT partner_id, id, amount_residual
+            FROM account_move
+            WHERE partner_id = ANY(%s) AND company_id = %s
+              AND move_type = 'out_invoice' AND state = 'posted'
+              AND payment_state IN ('not_paid', 'partial')
+            ORDER BY partner_id, invoice_date, id
+        """, (list(partner_ids), company.id))
+        rows = self._cr.fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows], [float(row[2]) for row in rows]
+
+    def _build_preview(self):
+        """Parse, match and allocate the file; replace the preview rows.
+
+        :return: [(invoice id, import line, amount)] in allocation order
+        """
+        self.ensure_one()
+        currency = self.currency_id or self.env.company.currency_id
+        factor = 10 ** currency.decimal_places
+        today = fields.Date.context_today(self)
+
+        values = []
+        for number, row in self._read_rows():
+            reference = str(row.get('reference') or '').strip()
+            if reference.endswith('.0') and isinstance(row.get('reference'), float):
+                reference = reference[:-2]
+            line = {'row': number, 'reference': reference, 'status': 'error', 'allocated': 0.0, 'invoice_count': 0}
+            try:
+                line['amount'] = _parse_amount(row.get('amount'))
+                line['date'] = _parse_date(row.get('date')) or today
+            except (TypeError, ValueError) as e:
+                line['message'] = str(e)
+                values.append(line)
+                continue
+            if not reference:
+                line['message'] = _("No reference or phone number.")
+            elif line['amount'] <= 0:
+                line['message'] = _("The amount must be positive.")
+            else:
+                line['status'] = 'unmatched'
+            values.append(line)
+
+        matches = self._match_partners({line['reference'] for line in values if line['status'] == 'unmatched'})
+        for line in values:
+            if line['status'] != 'unmatched':
+                continue
+            partner_ids = matches.get(line['reference']) or []
+            if len(partner_ids) == 1:
+                line['partner_id'] = partner_ids[0]
+                line['status'] = 'matched'
+            elif partner_ids:
+                line['status'] = 'ambiguous'
+                line['message'] = _("%s owners share this reference.") % len(partner_ids)
+            else:
+                line['message'] = _("No owner with this reference or phone number.")
+
+        payable = sorted(
+            (line for line in values if line['status'] == 'matched'),
+            key=lambda line: (line['partner_id'], line['date'], line['row']),
+        )
+        invoice_partners, invoice_ids, residuals = self._open_invoices(
+            {line['partner_id'] for line in payable}, self.journal_id.company_id or self.env.company,
+        )
+        allocations = _fifo_allocate(
+            invoice_partners, [round(residual * factor) for residual in residuals],
+            [line['partner_id'] for line in payable], [round(line['amount'] * factor) for line in payable],
+        )
+        for __, payment, cents in allocations:
+            payable[payment]['allocated'] += cents / factor
+            payable[payment]['invoice_count'] += 1
+        for line in payable:
+            left = currency.round(line['amount'] - line['allocated'])
+            if left > 0:
+                line['status'] = 'credit'
+                line['message'] = _("%s exceeds the open invoices and stays as customer credit.") % left
+
+        self.line_ids = [(5, 0, 0)] + [(0, 0, line) for line in sorted(values, key=lambda line: line['row'])]
+        self.state = 'preview'
+        lines = {line.row: line for line in self.line_ids}
+        return [(invoice_ids[invoice], lines[payable[payment]['row']], cents / factor)
+                for invoice, payment, cents in allocations]
+
+    def action_preview(self):
+        self._build_preview()
+        _logger.info("Payment import %s: %s row(s), %s importable", self.filename, self.row_count, self.matched_count)
+        return self._reopen()
+
+    def action_import(self):
+        """Create, post and reconcile the payments of the matched rows in batches."""
+        self.ensure_one()
+        if self.state == 'done':
+            raise UserError(_("This file has already been imported."))
+        allocations = self._build_preview()
+        lines = self.line_ids.filtered(lambda l: l.status in ('matched', 'credit'))
+        if not lines:
+            raise UserError(_("No row matches an owner."))
+        invoices = self.env['account.move'].browse(list(dict.fromkeys(invoice_id for invoice_id, __, __ in allocations)))
+        before = invoices._vet_dashboard_snapshot()
+        allocations_by_partner = defaultdict(list)
+        for invoice_id, line, __ in allocations:
+            allocations_by_partner[line.partner_id.id].append((invoice_id, line))
+
+        lines_by_partner = defaultdict(lambda: self.env['vet.payment.import.line'])
+        for line in lines:
+            lines_by_partner[line.partner_id.id] |= line
+        batch = self.env['vet.payment.import.line']
+        for partner_id, partner_lines in lines_by_partner.items():
+            batch |= partner_lines
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                self._import_batch(batch, allocations_by_partner)
+                batch = self.env['vet.payment.import.line']
+        if batch:
+            self._import_batch(batch, allocations_by_partner)
+
+        invoices._vet_refresh_reporting(before)
+        self.state = 'done'
+        _logger.info("Payment import %s: %s payment(s) for %s, %s invoice(s) reconciled",
+                     self.filename, len(lines), sum(lines.mapped('amount')), len(invoices))
+        return self._reopen()
+
+    def _import_batch(self, lines, allocations_by_partner):
+        """One create, one post and one reconciliation for the payments of ``lines``."""
+        payments = self.env['account.payment'].create([{
+            'payment_type': 'inbound',
+            'partner_type': 'customer',
+            'partner_id': line.partner_id.id,
+            'amount': line.amount,
+            'date': line.date,
+            'journal_id': self.journal_id.id,
+            'payment_reference': _("Import %s row %s") % (self.filename or '', line.row),
+        } for line in lines])
+        payments.action_post()
+        if payments.filtered(lambda p: not p.move_id):
+            raise UserError(_("Journal %s posts no entry for payments; configure its outstanding receipts account.")
+                            % self.journal_id.name)
+        for line, payment in zip(lines, payments):
+            line.payment_id = payment
+
+        def receivable_lines(moves):
+            lines_by_move = defaultdict(lambda: self.env['account.move.line'])
+            for aml in moves.line_ids:
+                if aml.account_id.account_type == 'asset_receivable' and not aml.reconciled:
+                    lines_by_move[aml.move_id.id] |= aml
+            return lines_by_move
+
+        partner_ids = set(lines.partner_id.ids)
+        invoice_ids = {invoice_id for partner_id in partner_ids for invoice_id, __ in allocations_by_partner[partner_id]}
+        invoice_lines = receivable_lines(self.env['account.move'].browse(invoice_ids))
+        payment_lines = receivable_lines(payments.move_id)
+
+        # Per partner, a chain adding the invoices and payments in allocation
+        # order, so each level only matches what the previous one left open.
+        plans = []
+        for partner_id in partner_ids:
+            plan, seen_lines, seen_invoices = None, set(), set()
+            for invoice_id, line in allocations_by_partner[partner_id]:
+                new = self.env['account.move.line']
+                if line.id not in seen_lines:
+                    seen_lines.add(line.id)
+                    new |= payment_lines[line.payment_id.move_id.id]
+                if invoice_id not in seen_invoices:
+                    seen_invoices.add(invoice_id)
+                    new |= invoice_lines[invoice_id]
+                plan = new if plan is None else [plan, new]
+            if plan is not None:
+                plans.append(plan)
+        if plans:
+            self.env['account.move.line']._reconcile_plan(plans)
+        _logger.info("Payment import %s: batch of %s payment(s) posted and reconciled", self.filename, len(payments))
+
+    def _reopen(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Import Payments"),
+            'res_model': 'vet.payment.import',
+            'view_mode': 'form',
+            'res_id': self.id,
+            'target': 'current',
+        }
+
+
+class VetPaymentImportLine(models.TransientModel):
+    _name = 'vet.payment.import.line'
+    _description = 'Vet Bulk Payment Import Row'
+    _order = 'row'
+
+    import_id = fields.Many2one('vet.payment.import', string="Import", required=True, ondelete='cascade')
+    currency_id = fields.Many2one(related='import_id.currency_id')
+    row = fields.Integer(string="Row")
+    reference = fields.Char(string="Reference")
+    date = fields.Date(string="Date")
+    amount = fields.Monetary(string="Amount", currency_field='currency_id')
+    partner_id = fields.Many2one('res.partner', string="Owner")
+    status = fields.Selection([
+        ('matched', 'Matched'),
+        ('credit', 'Partly Credit'),
+        ('unmatched', 'No Owner'),
+        ('ambiguous', 'Ambiguous'),
+        ('error', 'Invalid'),
+    ], string="Status")
+    message = fields.Char(string="Message")
+    allocated = fields.Monetary(string="Allocated", currency_field='currency_id')
+    invoice_count = fields.Integer(string="Invoices")
+    payment_id = fields.Many2one('account.payment', string="Payment")
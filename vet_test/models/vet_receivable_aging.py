@@ -0,0 +1,77 @@
+from odoo import fields, models, _
+
+
+class VetReceivableAging(models.Model):
+    _name = 'vet.receivable.aging'
+    _description = 'Vet Receivables Aging'
+    _auto = False  # SQL view, see init()
+    _order = 'amount_residual desc'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one('res.partner', string="Customer", readonly=True)
+    owner_id = fields.Many2one('vet.animal.owner', string="Owner", readonly=True)
+    analytic_account_id = fields.Many2one('account.analytic.account', string="Branch", readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string="Currency")
+    invoice_count = fields.Integer(string="Invoices", readonly=True)
+    oldest_due_date = fields.Date(string="Oldest Due Date", readonly=True)
+    amount_0_30 = fields.Monetary(string="0-30", currency_field='currency_id', readonly=True)
+    amount_31_60 = fields.Monetary(string="31-60", currency_field='currency_id', readonly=True)
+    amount_61_90 = fields.Monetary(string="61-90", currency_field='currency_id', readonly=True)
+    amount_90_plus = fields.Monetary(string="90+", currency_field='currency_id', readonly=True)
+    amount_residual = fields.Monetary(string="Total Due", currency_field='currency_id', readonly=True)
+
+    def init(self):
+        cr = self._cr
+        cr.execute(f"DROP VIEW IF EXISTS {self._table} CASCADE")
+        # One pass over the open customer invoices; the age is counted in days
+        # past the due date, so invoices not yet due land in 0-30.
+        cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT
+                    MIN(m.id) AS id,
+                    m.partner_id,
+                    o.owner_id,
+                    m.analytic_account_id,
+                    m.company_id,
+                    COUNT(*) AS invoice_count,
+                    MIN(COALESCE(m.invoice_date_due, m.invoice_date)) AS oldest_due_date,
+                    SUM(m.amount_residual_signed) FILTER (WHERE m.age <= 30) AS amount_0_30,
+                    SUM(m.amount_residual_signed) FILTER (WHERE m.age BETWEEN 31 AND 60) AS amount_31_60,
+                    SUM(m.amount_residual_signed) FILTER (WHERE m.age BETWEEN 61 AND 90) AS amount_61_90,
+                    SUM(m.amount_residual_signed) FILTER (WHERE m.age > 90) AS amount_90_plus,
+                    SUM(m.amount_residual_signed) AS amount_residual
+                FROM (
+                    SELECT am.*, CURRENT_DATE - COALESCE(am.invoice_date_due, am.invoice_date, CURRENT_DATE) AS age
+                    FROM account_move am
+                    WHERE am.move_type = 'out_invoice'
+                      AND am.state = 'posted'
+                      AND am.payment_state IN ('not_paid', 'partial')
+                ) m
+                LEFT JOIN (
+                    SELECT partner_id, MIN(id) AS owner_id
+                    FROM vet_animal_owner
+                    GROUP BY partner_id
+                ) o ON o.partner_id = m.partner_id
+                GROUP BY m.partner_id, o.owner_id, m.analytic_account_id, m.company_id
+            )
+        """)
+
+    def action_open_invoices(self):
+        """Drill down to the open invoices behind this aging line."""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Open Invoices: %s", self.partner_id.display_name),
+            'res_model': 'account.move',
+            'view_mode': 'list,form',
+            'domain': [
+                ('move_type', '=', 'out_invoice'),
+                ('state', '=', 'posted'),
+                ('payment_state', 'in', ('not_paid', 'partial')),
+                ('partner_id', '=', self.partner_id.id),
+                ('analytic_account_id', '=', self.analytic_account_id.id),
+                ('company_id', '=', self.company_id.id),
+            ],
+            'context': {'create': False},
+        }
@@ -0,0 +1,135 @@
+from odoo import api, fields, models
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Open posted customer invoices per (partner, company); {where} narrows the
+# source rows, e.g. to the partners being refreshed.
+_LEDGER_QUERY = """
+    SELECT m.partner_id, m.company_id,
+           SUM(m.amount_residual) AS open_amount,
+           COUNT(*) AS open_count,
+           MIN(COALESCE(m.invoice_date_due, m.invoice_date)) AS oldest_due_date
+    FROM account_move m
+    WHERE m.move_type = 'out_invoice'
+      AND m.state = 'posted'
+      AND m.payment_state IN ('not_paid', 'partial')
+      AND m.partner_id IS NOT NULL
+      {where}
+    GROUP BY m.partner_id, m.company_id
+"""
+
+
+class VetReceivableLedger(models.Model):
+    _name = 'vet.receivable.ledger'
+    _description = 'Vet Owner Receivable Summary'
+    _rec_name = 'partner_id'
+    _log_access = False
+
+    partner_id = fields.Many2one('res.partner', string="Customer", required=True, readonly=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string="Company", required=True, readonly=True, ondelete='cascade')
+    open_amount = fields.Float(string="Open Amount", digits=(16, 2), readonly=True)
+    open_count = fields.Integer(string="Open Invoices", readonly=True)
+    oldest_due_date = fields.Date(string="Oldest Due Date", readonly=True)
+
+    _sql_constraints = [
+        ('partner_company_uniq', 'unique(partner_id, company_id)', 'One receivable summary per customer and company.'),
+    ]
+
+    @api.model
+    def _refresh_partners(self, partners):
+        """Recompute the summary rows of ``partners`` from their open invoices.
+
+        Each partner is locked first, in id order, so that two postings or
+        payments of the same customer refresh its rows one after the other:
+        the later one then conflicts on the row the first one wrote and is
+        retried on fresh data instead of writing totals from its own snapshot.
+        """
+        partner_ids = tuple(set(partners.ids))
+        if not partner_ids:
+            return
+        self.env['account.move'].flush_model(
+            ['partner_id', 'company_id', 'move_type', 'state', 'payment_state', 'amount_residual',
+             'invoice_date_due', 'invoice_date']
+        )
+        cr = self._cr
+        cr.execute("SELECT pg_advisory_xact_lock(hashtext('vet_receivable_ledger'), partner_id) "
+                   "FROM unnest(%s::int[]) AS partner_id ORDER BY partner_id",
+                   (sorted(partner_ids),))
+        cr.execute(f"""
+            WITH fresh AS ({_LEDGER_QUERY.format(where="AND m.partner_id IN %s")}),
+            cleared AS (
+                DELETE FROM vet_receivable_ledger l
+                WHERE l.partner_id IN %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM fresh f WHERE f.partner_id = l.partner_id AND f.company_id = l.company_id
+                  )
+            )
+            INSERT INTO vet_receivable_ledger (partner_id, company_id, open_amount, open_count, oldest_due_date)
+            SELECT * FROM fresh
+            ON CONFLICT (partner_id, company_id) DO UPDATE SET
+                open_amount = EXCLUDED.open_amount,
+                open_count = EXCLUDED.open_count,
+                oldest_due_date = EXCLUDED.oldest_due_date
+        """, (partner_ids, partner_ids))
+        self.invalidate_model()
+
+    @api.model
+    def _get_balances(self, partners):
+        """{partner id: (open amount, open invoice count)} over the current companies."""
+        if not partners:
+            return {}
+        self.flush_model()
+        self._cr.execute("""
+            SELECT partner_id, SUM(open_amount), SUM(open_count)
+            FROM vet_receivable_ledger
+            WHERE partner_id IN %s AND company_id IN %s
+            GROUP BY partner_id
+        """, (tuple(partners.ids), tuple(self.env.companies.ids)))
+        return {partner_id: (amount, count) for partner_id, amount, count in self._cr.fetchall()}
+
+    @api.model
+    def _check_ledger(self):
+        """Return the (partner id, company id) keys whose row differs from the invoices."""
+        self.env['account.move'].flush_model()
+        cr = self._cr
+        cr.execute(f"""
+            WITH fresh AS ({_LEDGER_QUERY.format(where="")})
+            SELECT COALESCE(f.partner_id, l.partner_id), COALESCE(f.company_id, l.company_id)
+            FROM fresh f
+            FULL OUTER JOIN vet_receivable_ledger l
+                ON l.partner_id = f.partner_id AND l.company_id = f.company_id
+            WHERE l.id IS NULL OR f.partner_id IS NULL
+               OR ROUND(l.open_amount::numeric, 2) != ROUND(f.open_amount::numeric, 2)
+               OR l.open_count != f.open_count
+               OR l.oldest_due_date IS DISTINCT FROM f.oldest_due_date
+        """)
+        return cr.fetchall()
+
+    @api.model
+    def _rebuild(self):
+        """Backfill: rebuild the whole summary from the open invoices."""
+        self.env['account.move'].flush_model()
+        cr = self._cr
+        cr.execute("DELETE FROM vet_receivable_ledger")
+        cr.execute(f"""
+            INSERT INTO vet_receivable_ledger (partner_id, company_id, open_amount, open_count, oldest_due_date)
+            {_LEDGER_QUERY.format(where="")}
+        """)
+        self.invalidate_model()
+        _logger.info("Receivable ledger rebuilt: %s rows", cr.rowcount)
+        return True
+
+    @api.model
+    def _cron_check_ledger(self):
+        """Repair the partners that drifted, e.g. after invoices changed outside the hooks."""
+        drift = self._check_ledger()
+        if drift:
+            _logger.warning("Receivable ledger: %s row(s) out of date, refreshing", len(drift))
+            self._refresh_partners(self.env['res.partner'].browse({partner_id for partner_id, __ in drift}))
+        return len(drift)
+
+    def init(self):
+        self._cr.execute("SELECT 1 FROM vet_receivable_ledger LIMIT 1")
+        if not self._cr.fetchone():
+            self._rebuild()
@@ -0,0 +1,202 @@
+from odoo import api, fields, models
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Posted customer invoices/refunds grouped by rollup key, for the full rebuild.
+_ROLLUP_QUERY = """
+    INSERT INTO vet_revenue_daily (
+        date, analytic_account_id, doctor_id, payment_method, company_id,
+        invoice_count, amount_total, amount_paid, amount_residual
+    )
+    SELECT
+        m.invoice_date, m.analytic_account_id, v.doctor_id, m.payment_method, m.company_id,
+        COUNT(*) FILTER (WHERE m.move_type = 'out_invoice'),
+        SUM(m.amount_total_signed),
+        SUM(m.amount_total_signed - m.amount_residual_signed),
+        SUM(m.amount_residual_signed)
+    FROM account_move m
+    LEFT JOIN vet_animal_visit v ON v.id = m.visit_id
+    WHERE m.move_type IN ('out_invoice', 'out_refund')
+      AND m.state = 'posted'
+      AND m.invoice_date IS NOT NULL
+    GROUP BY m.invoice_date, m.analytic_account_id, v.doctor_id, m.payment_method, m.company_id
+    ON CONFLICT (company_id, date, COALESCE(analytic_account_id, 0), COALESCE(doctor_id, 0), COALESCE(payment_method, ''))
+    DO UPDATE SET
+        invoice_count = EXCLUDED.invoice_count,
+        amount_total = EXCLUDED.amount_total,
+        amount_paid = EXCLUDED.amount_paid,
+        amount_residual = EXCLUDED.amount_residual
+"""
+
+# One row per rollup key. Two transactions refreshing the same day then
+# conflict on the key instead of both inserting their totals.
+_ROLLUP_KEY_INDEX = 'vet_revenue_daily_key_uniq'
+
+# What each posted invoice last added to the rollup, so a refresh can take
+# its old contribution back out without rescanning the rest of the day.
+_MOVE_TABLE = 'vet_revenue_daily_move'
+
+_MOVE_QUERY = """
+    INSERT INTO vet_revenue_daily_move (
+        move_id, date, analytic_account_id, doctor_id, payment_method, company_id,
+        invoice_count, amount_total, amount_paid, amount_residual
+    )
+    SELECT
+        m.id, m.invoice_date, m.analytic_account_id, v.doctor_id, m.payment_method, m.company_id,
+        (m.move_type = 'out_invoice')::int,
+        m.amount_total_signed,
+        m.amount_total_signed - m.amount_residual_signed,
+        m.amount_residual_signed
+    FROM account_move m
+    LEFT JOIN vet_animal_visit v ON v.id = m.visit_id
+    WHERE m.move_type IN ('out_invoice', 'out_refund')
+      AND m.state = 'posted'
+      AND m.invoice_date IS NOT NULL
+      {where}
+"""
+
+# New contribution of the moves minus the one stored for them, summed per
+# rollup key and added onto the rollup rows.
+_DELTA_QUERY = """
+    WITH delta AS (
+        SELECT date, analytic_account_id, doctor_id, payment_method, company_id,
+               SUM(invoice_count) AS invoice_count,
+               SUM(amount_total) AS amount_total,
+               SUM(amount_paid) AS amount_paid,
+               SUM(amount_residual) AS amount_residual
+        FROM (
+            SELECT m.invoice_date AS date, m.analytic_account_id, v.doctor_id, m.payment_method, m.company_id,
+                   (m.move_type = 'out_invoice')::int AS invoice_count,
+                   m.amount_total_signed AS amount_total,
+                   m.amount_total_signed - m.amount_residual_signed AS amount_paid,
+                   m.amount_residual_signed AS amount_residual
+            FROM account_move m
+            LEFT JOIN vet_animal_visit v ON v.id = m.visit_id
+            WHERE m.id IN %(move_ids)s
+              AND m.move_type IN ('out_invoice', 'out_refund')
+              AND m.state = 'posted'
+              AND m.invoice_date IS NOT NULL
+            UNION ALL
+            SELECT date, analytic_account_id, doctor_id, payment_method, company_id,
+                   -invoice_count, -amount_total, -amount_paid, -amount_residual
+            FROM vet_revenue_daily_move
+            WHERE move_id IN %(move_ids)s
+        ) AS contributions
+        GROUP BY date, analytic_account_id, doctor_id, payment_method, company_id
+    )
+    INSERT INTO vet_revenue_daily (
+        date, analytic_account_id, doctor_id, payment_method, company_id,
+        invoice_count, amount_total, amount_paid, amount_residual
+    )
+    SELECT date, analytic_account_id, doctor_id, payment_method, company_id,
+           invoice_count, amount_total, amount_paid, amount_residual
+    FROM delta
+    WHERE invoice_count != 0 OR amount_total != 0 OR amount_paid != 0 OR amount_residual != 0
+    ORDER BY company_id, date, analytic_account_id, doctor_id, payment_method
+    ON CONFLICT (company_id, date, COALESCE(analytic_account_id, 0), COALESCE(doctor_id, 0), COALESCE(payment_method, ''))
+    DO UPDATE SET
+        invoice_count = vet_revenue_daily.invoice_count + EXCLUDED.invoice_count,
+        amount_total = vet_revenue_daily.amount_total + EXCLUDED.amount_total,
+        amount_paid = vet_revenue_daily.amount_paid + EXCLUDED.amount_paid,
+        amount_residual = vet_revenue_daily.amount_residual + EXCLUDED.amount_residual
+    RETURNING id, invoice_count = 0 AND amount_total = 0 AND amount_paid = 0 AND amount_residual = 0
+"""
+
+
+class VetRevenueDaily(models.Model):
+    _name = 'vet.revenue.daily'
+    _description = 'Vet Daily Revenue'
+    _order = 'date desc'
+    _rec_name = 'date'
+    _log_access = False
+
+    date = fields.Date(string="Date", required=True, index=True, readonly=True)
+    analytic_account_id = fields.Many2one('account.analytic.account', string="Branch", index=True, readonly=True)
+    doctor_id = fields.Many2one('vet.animal.doctor', string="Doctor", index=True, readonly=True)
+    payment_method = fields.Selection(
+        [('cash', 'Cash'), ('bank', 'Bank')],
+        string="Payment Method",
+        readonly=True
+    )
+    company_id = fields.Many2one('res.company', string="Company", required=True, readonly=True)
+    currency_id = fields.Many2one(related='company_id.currency_id', string="Currency")
+    invoice_count = fields.Integer(string="Invoices", readonly=True)
+    amount_total = fields.Monetary(string="Invoiced", currency_field='currency_id', readonly=True)
+    amount_paid = fields.Monetary(string="Paid", currency_field='currency_id', readonly=True)
+    amount_residual = fields.Monetary(string="Due", currency_field='currency_id', readonly=True)
+
+    @api.model
+    def _refresh_moves(self, moves):
+        """Apply to the rollup what changed on ``moves``.
+
+        Each move's contribution is compared with the one stored in
+        vet_revenue_daily_move and only the signed difference is added to
+        the affected (company, day, branch, doctor, payment method) rows, so
+        a posting touches its own keys instead of rebuilding the whole day.
+        Moves are locked per (company, move) first: two refreshes of the
+        same invoice run one after the other and the second sees the
+        contribution stored by the first. Rows that drop back to zero go.
+        """
+        moves = moves.filtered(lambda m: m.move_type in ('out_invoice', 'out_refund'))
+        if not moves:
+            return
+        self.env['account.move'].flush_model()
+        self.env['vet.animal.visit'].flush_model(['doctor_id'])
+        cr = self._cr
+        cr.execute("SELECT pg_advisory_xact_lock(hashtext('vet_revenue_daily:' || company_id), id) "
+                   "FROM account_move WHERE id IN %s ORDER BY company_id, id", (tuple(moves.ids),))
+        cr.execute(_DELTA_QUERY, {'move_ids': tuple(moves.ids)})
+        emptied = tuple(row_id for row_id, empty in cr.fetchall() if empty)
+        if emptied:
+            cr.execute("DELETE FROM vet_revenue_daily WHERE id IN %s", (emptied,))
+        cr.execute("DELETE FROM vet_revenue_daily_move WHERE move_id IN %s", (tuple(moves.ids),))
+        cr.execute(_MOVE_QUERY.format(where="AND m.id IN %s"), (tuple(moves.ids),))
+        self.invalidate_model()
+        _logger.debug("Revenue rollup updated for %s move(s)", len(moves))
+
+    @api.model
+    def _rebuild(self):
+        """Backfill: rebuild the whole rollup from posted invoices."""
+        self.env['account.move'].flush_model()
+        self.env['vet.animal.visit'].flush_model(['doctor_id'])
+        cr = self._cr
+        cr.execute("DELETE FROM vet_revenue_daily_move")
+        cr.execute(_MOVE_QUERY.format(where=""))
+        cr.execute("DELETE FROM vet_revenue_daily")
+        cr.execute(_ROLLUP_QUERY)
+        self.invalidate_model()
+        _logger.info("Revenue rollup rebuilt: %s rows", cr.rowcount)
+        return True
+
+    def init(self):
+        self._cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", (_ROLLUP_KEY_INDEX,))
+        has_key = bool(self._cr.fetchone())
+        self._cr.execute("SELECT 1 FROM pg_tables WHERE tablename = %s", (_MOVE_TABLE,))
+        has_moves = bool(self._cr.fetchone())
+        if has_key and has_moves:
+            return
+        if not has_key:
+            # Rows from before the key may hold duplicates: start over from the invoices
+            self._cr.execute("DELETE FROM vet_revenue_daily")
+            self._cr.execute(f"""
+                CREATE UNIQUE INDEX {_ROLLUP_KEY_INDEX} ON vet_revenue_daily (
+                    company_id, date, COALESCE(analytic_account_id, 0), COALESCE(doctor_id, 0), COALESCE(payment_method, '')
+                )
+            """)
+        if not has_moves:
+            self._cr.execute(f"""
+                CREATE TABLE {_MOVE_TABLE} (
+                    move_id integer PRIMARY KEY REFERENCES account_move (id) ON DELETE CASCADE,
+                    date date NOT NULL,
+                    analytic_account_id integer,
+                    doctor_id integer,
+                    payment_method varchar,
+                    company_id integer NOT NULL,
+                    invoice_count integer NOT NULL,
+                    amount_total numeric NOT NULL,
+                    amount_paid numeric NOT NULL,
+                    amount_residual numeric NOT NULL
+                )
+            """)
+        self._rebuild()
@@ -0,0 +1,71 @@
+/** @odoo-module **/
+
+import { Component, onWillStart, onWillUnmount, useState } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { rpc } from "@web/core/network/rpc";
+import { useService } from "@web/core/utils/hooks";
+import { formatMonetary } from "@web/views/fields/formatters";
+
+export const TILES = [
+    { key: "animals", label: "Animals", icon: "fa-paw", color: "primary" },
+    { key: "owners", label: "Owners", icon: "fa-user", color: "success" },
+    { key: "doctors", label: "Doctors", icon: "fa-user-md", color: "warning" },
+    { key: "open_visits", label: "Open Visits", icon: "fa-stethoscope", color: "info" },
+    { key: "pending_invoices", label: "Pending Invoices", icon: "fa-hourglass-half", color: "danger" },
+    { key: "paid_invoices", label: "Paid Invoices", icon: "fa-check", color: "success" },
+    { key: "revenue_today", label: "Revenue Today", icon: "fa-money", color: "dark", monetary: true },
+];
+
+export class VetDashboard extends Component {
+    static template = "vet_test.VetDashboard";
+    static props = ["*"];
+
+    setup() {
+        this.action = useService("action");
+        this.busService = useService("bus_service");
+        this.tiles = TILES;
+        this.state = useState({ loading: true, branches: [], totals: {}, date: false, currency_id: false });
+        onWillStart(() => this.load());
+
+        // Branch channels are added server side; make sure they reflect the
+        // branches the user is currently locked to before listening.
+        this.onDelta = (payload) => this.applyDelta(payload);
+        this.busService.forceUpdateChannels();
+        this.busService.subscribe("vet_test.dashboard/delta", this.onDelta);
+        onWillUnmount(() => this.busService.unsubscribe("vet_test.dashboard/delta", this.onDelta));
+    }
+
+    async load() {
+        const summary = await rpc("/vet_test/dashboard/summary");
+        Object.assign(this.state, summary, { loading: false });
+    }
+
+    applyDelta({ branch_id, tiles }) {
+        const branch = this.state.branches.find((b) => b.id === branch_id);
+        if (!branch) {
+            return;
+        }
+        for (const [key, delta] of Object.entries(tiles)) {
+            branch.tiles[key] = (branch.tiles[key] || 0) + delta;
+        }
+    }
+
+    formatValue(tile, value) {
+        if (tile.monetary) {
+            return formatMonetary(value, { currencyId: this.state.currency_id });
+        }
+        return value;
+    }
+
+    openVisits(branch) {
+        this.action.doAction({
+            type: "ir.actions.act_window",
+            name: branch.name,
+            res_model: "vet.animal.visit",
+            views: [[false, "kanban"], [false, "list"], [false, "form"]],
+            domain: [["analytic_account_id", "=", branch.id], ["state", "in", ["draft", "confirmed"]]],
+        });
+    }
+}
+
+registry.category("actions").add("vet_test.dashboard", VetDashboard);
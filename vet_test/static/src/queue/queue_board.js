@@ -0,0 +1,70 @@
+/** @odoo-module **/
+
+import { Component, onWillStart, onWillUnmount, useState } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { rpc } from "@web/core/network/rpc";
+import { useService } from "@web/core/utils/hooks";
+import { deserializeDateTime, formatDateTime } from "@web/core/l10n/dates";
+
+export class VetQueueBoard extends Component {
+    static template = "vet_test.VetQueueBoard";
+    static props = ["*"];
+
+    setup() {
+        this.action = useService("action");
+        this.busService = useService("bus_service");
+        this.state = useState({ loading: true, branch_id: false, branches: [], rows: [] });
+        onWillStart(() => this.load());
+
+        this.onUpdate = (payload) => this.applyUpdate(payload);
+        this.busService.forceUpdateChannels();
+        this.busService.subscribe("vet_test.queue/update", this.onUpdate);
+        onWillUnmount(() => this.busService.unsubscribe("vet_test.queue/update", this.onUpdate));
+    }
+
+    async load(branchId) {
+        const board = await rpc("/vet_test/queue", { branch_id: branchId || false });
+        Object.assign(this.state, board, { loading: false });
+    }
+
+    onBranchChange(ev) {
+        this.load(parseInt(ev.target.value));
+    }
+
+    applyUpdate({ branch_id, rows, removed }) {
+        if (branch_id !== this.state.branch_id) {
+            return;
+        }
+        const gone = new Set([...removed, ...rows.map((row) => row.id)]);
+        const queue = this.state.rows.filter((row) => !gone.has(row.id));
+        queue.push(...rows);
+        queue.sort((a, b) => (a.date < b.date ? -1 : a.date > b.date ? 1 : a.id - b.id));
+        this.state.rows = queue;
+    }
+
+    get doctors() {
+        const groups = new Map();
+        for (const row of this.state.rows) {
+            if (!groups.has(row.doctor_id)) {
+                groups.set(row.doctor_id, { id: row.doctor_id, name: row.doctor_name, rows: [] });
+            }
+            groups.get(row.doctor_id).rows.push(row);
+        }
+        return [...groups.values()];
+    }
+
+    formatTime(row) {
+        return formatDateTime(deserializeDateTime(row.date), { format: "HH:mm" });
+    }
+
+    openVisit(row) {
+        this.action.doAction({
+            type: "ir.actions.act_window",
+            res_model: "vet.animal.visit",
+            res_id: row.id,
+            views: [[false, "form"]],
+        });
+    }
+}
+
+registry.category("actions").add("vet_test.queue_board", VetQueueBoard);
@@ -0,0 +1,110 @@
+import random
+import unittest
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from odoo.addons.vet_test.models.vet_payment_import import np, _fifo_allocate, _fifo_allocate_python
+
+
+def _random_side(rng, partners, count):
+    """``count`` amounts in cents spread over ``partners``, sorted by partner as the import passes them."""
+    owners = sorted(rng.choice(partners) for __ in range(count))
+    return owners, [rng.randint(1, 50_000) for __ in owners]
+
+
+@tagged('post_install', '-at_install')
+class TestFifoAllocate(BaseCase):
+
+    def _random_cases(self, count=500):
+        rng = random.Random(4242)
+        for __ in range(count):
+            partners = rng.sample(range(1, 60), rng.randint(1, 8))
+            invoice_partners, invoice_cents = _random_side(rng, partners, rng.randint(0, 25))
+            payment_partners, payment_cents = _random_side(rng, partners, rng.randint(0, 10))
+            yield invoice_partners, invoice_cents, payment_partners, payment_cents
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy_matches_python(self):
+        for case in self._random_cases():
+            self.assertEqual(_fifo_allocate(*case), _fifo_allocate_python(*case), case)
+
+    def test_allocation_is_fifo_per_partner(self):
+        for invoice_partners, invoice_cents, payment_partners, payment_cents in self._random_cases():
+            allocations = _fifo_allocate(invoice_partners, invoice_cents, payment_partners, payment_cents)
+            invoice_paid = [0] * len(invoice_cents)
+            payment_used = [0] * len(payment_cents)
+            for invoice, payment, amount in allocations:
+                self.assertEqual(invoice_partners[invoice], payment_partners[payment])
+                invoice_paid[invoice] += amount
+                payment_used[payment] += amount
+            for partner in set(invoice_partners) | set(payment_partners):
+                invoices = [i for i, owner in enumerate(invoice_partners) if owner == partner]
+                payments = [p for p, owner in enumerate(payment_partners) if owner == partner]
+                due = sum(invoice_cents[i] for i in invoices)
+                paid = sum(payment_cents[p] for p in payments)
+                self.assertEqual(sum(invoice_paid[i] for i in invoices), min(due, paid))
+                # Oldest first: an invoice is only touched once all older ones are settled
+                touched = [i for i in invoices if invoice_paid[i]]
+                for i in touched[:-1]:
+                    self.assertEqual(invoice_paid[i], invoice_cents[i])
+                self.assertEqual(touched, invoices[:len(touched)])
+
+    def test_empty_sides(self):
+        self.assertEqual(_fifo_allocate([], [], [1], [100]), [])
+        self.assertEqual(_fifo_allocate([1], [100], [], []), [])
+        self.assertEqual(_fifo_allocate([1], [100], [2], [100]), [])
+
+
+@tagged('post_install', '-at_install')
+class TestFifoReconciliationPlan(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.partner_a
+        cls.receivable = cls.partner.property_account_receivable_id
+        cls.bank_journal = cls.company_data['default_journal_bank']
+        cls.invoices = cls.env['account.move']
+        for day, amount, due in ((1, 100.0, 31), (2, 200.0, 10), (3, 300.0, 5)):
+            invoice = cls.init_invoice(
+                'out_invoice', partner=cls.partner, invoice_date=f'2024-01-{day:02d}', amounts=[amount],
+            )
+            # Due dates run backwards so that a due date ordering would settle the newest first
+            invoice.write({'invoice_payment_term_id': False, 'invoice_date_due': f'2024-01-{due:02d}'})
+            invoice.action_post()
+            cls.invoices |= invoice
+        cls.Wizard = cls.env['vet.animal.visit.payment.wizard']
+
+    def _pay(self, amount):
+        payment = self.env['account.move'].create({
+            'move_type': 'entry',
+            'date': fields.Date.today(),
+            'journal_id': self.bank_journal.id,
+            'line_ids': [
+                (0, 0, {'name': "Payment", 'credit': amount, 'account_id': self.receivable.id, 'partner_id': self.partner.id}),
+                (0, 0, {'name': "Bank", 'debit': amount, 'account_id': self.bank_journal.default_account_id.id}),
+            ],
+        })
+        payment.action_post()
+        allocations = self.Wizard._allocate_fifo(self.invoices, amount)
+        payment_lines = payment.line_ids.filtered(lambda l: l.account_id == self.receivable)
+        self.env['account.move.line']._reconcile_plan([
+            self.Wizard._fifo_reconciliation_plan(payment_lines, allocations, self.receivable)
+        ])
+        return allocations
+
+    def test_partial_payment_settles_oldest_first(self):
+        totals = self.invoices.mapped('amount_total')
+        allocations = self._pay(totals[0] + totals[1] + 50.0)
+        self.assertEqual([invoice for invoice, __ in allocations], list(self.invoices))
+        self.assertEqual(self.invoices.mapped('amount_residual'), [0.0, 0.0, totals[2] - 50.0])
+        self.assertEqual(self.invoices[2].payment_state, 'partial')
+
+    def test_payment_within_first_invoice(self):
+        totals = self.invoices.mapped('amount_total')
+        allocations = self._pay(40.0)
+        self.assertEqual(len(allocations), 1)
+        self.assertEqual(self.invoices.mapped('amount_residual'), [totals[0] - 40.0, totals[1], totals[2]])
@@ -0,0 +1,174 @@
+"""Metrics for the clinic hot paths, rendered in the Prometheus text
+exposition format by ``/vet_test/metrics``.
+
+Each Odoo process accumulates its observations in memory, which costs a
+lock and a few additions per call, and adds them to the shared
+``vet_metrics_flow`` table at most every FLUSH_INTERVAL seconds on a cursor
+of its own. The scrape reads that table, so whichever prefork worker
+answers it reports the totals of all of them, at most FLUSH_INTERVAL late.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import threading
+import time
+
+from odoo import sql_db
+
+_logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds a process keeps its observations before adding them to the table
+FLUSH_INTERVAL = 10
+
+_lock = threading.Lock()
+# dbname -> {(flow, metric): value not yet added to the table}
+_pending = {}
+_last_flush = {}
+
+
+def observe(flow, duration, queries=0, error=False, dbname=None):
+    """Record one call of ``flow`` that took ``duration`` seconds on ``dbname``."""
+    if not dbname:
+        return
+    index = bisect_left(LATENCY_BUCKETS, duration)
+    now = time.monotonic()
+    with _lock:
+        pending = _pending.setdefault(dbname, defaultdict(float))
+        pending[flow, 'calls'] += 1
+        pending[flow, 'errors'] += error
+        pending[flow, 'queries'] += queries
+        pending[flow, 'duration_sum'] += duration
+        # Non cumulative per-bucket counts, the last bucket being +Inf
+        pending[flow, f'bucket_{index}'] += 1
+        due = now - _last_flush.setdefault(dbname, now) >= FLUSH_INTERVAL
+    if due:
+        flush(dbname)
+
+
+def flush(dbname):
+    """Add the observations of this process on ``dbname`` to the shared table."""
+    with _lock:
+        pending = _pending.pop(dbname, None)
+        _last_flush[dbname] = time.monotonic()
+    if not pending:
+        return
+    keys = list(pending)
+    try:
+        with sql_db.db_connect(dbname).cursor() as cr:
+            cr.execute("""
+                INSERT INTO vet_metrics_flow (flow, metric, value)
+                SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::float8[])
+                ON CONFLICT (flow, metric) DO UPDATE SET value = vet_metrics_flow.value + EXCLUDED.value
+            """, ([flow for flow, __ in keys], [metric for __, metric in keys], [pending[key] for key in keys]))
+    except Exception as e:
+        _logger.warning("Metrics not saved, keeping them for the next flush: %s", e)
+        with _lock:
+            current = _pending.setdefault(dbname, defaultdict(float))
+            for key, value in pending.items():
+                current[key] += value
+
+
+@contextmanager
+def track(flow, cr=None):
+    """Time the block as one call of ``flow``, counting the SQL queries run on
+    ``cr`` and whether it raised."""
+    queries = cr.sql_log_count if cr is not None else 0
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        if cr is not None:
+            queries = cr.sql_log_count - queries
+        observe(flow, time.perf_counter() - start, queries, error, cr.dbname if cr is not None else None)
+
+
+def instrument(flow):
+    """Decorator tracking a model method as ``flow`` on its environment's cursor."""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with track(flow, self.env.cr):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load(cr):
+    """{flow: (calls, errors, queries, duration sum, per-bucket counts)} of all processes.
+
+    The observations this process has not flushed yet are added to the table's.
+    """
+    cr.execute("SELECT flow, metric, value FROM vet_metrics_flow")
+    totals = defaultdict(float)
+    for flow, metric, value in cr.fetchall():
+        totals[flow, metric] += value
+    with _lock:
+        for key, value in _pending.get(cr.dbname, {}).items():
+            totals[key] += value
+    snapshot = {}
+    for (flow, metric), value in totals.items():
+        stats = snapshot.setdefault(flow, {'buckets': [0] * (len(LATENCY_BUCKETS) + 1)})
+        if metric.startswith('bucket_'):
+            stats['buckets'][int(metric[len('bucket_'):])] = int(value)
+        else:
+            stats[metric] = value
+    return {
+        flow: (int(stats.get('calls', 0)), int(stats.get('errors', 0)), int(stats.get('queries', 0)),
+               float(stats.get('duration_sum', 0.0)), stats['buckets'])
+        for flow, stats in snapshot.items()
+    }
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(snapshot, gauges=()):
+    """Exposition text of the flow metrics followed by ``gauges``.
+
+    :param snapshot: flow statistics as returned by :func:`load`
+    :param gauges: iterable of ``(name, help, samples)`` where samples is a
+        list of ``(labels dict, value)``
+    """
+    lines = [
+        '# HELP vet_test_flow_duration_seconds Latency of the clinic flows.',
+        '# TYPE vet_test_flow_duration_seconds histogram',
+    ]
+    for flow, (calls, __, __, duration_sum, buckets) in sorted(snapshot.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            le = bound if bound == '+Inf' else _format_value(bound)
+            lines.append(f'vet_test_flow_duration_seconds_bucket{{flow="{flow}",le="{le}"}} {cumulative}')
+        lines.append(f'vet_test_flow_duration_seconds_sum{{flow="{flow}"}} {_format_value(duration_sum)}')
+        lines.append(f'vet_test_flow_duration_seconds_count{{flow="{flow}"}} {calls}')
+
+    for name, index, help_text in (
+        ('vet_test_flow_calls_total', 0, 'Calls of the clinic flows.'),
+        ('vet_test_flow_errors_total', 1, 'Calls of the clinic flows that raised.'),
+        ('vet_test_flow_sql_queries_total', 2, 'SQL queries run by the clinic flows.'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for flow, values in sorted(snapshot.items()):
+            lines.append(f'{name}{{flow="{flow}"}} {values[index]}')
+
+    for name, help_text, samples in gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in sorted(labels.items()))
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text else f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'